@@ -1,19 +1,29 @@
-import streamlit as st
-import matplotlib
+import json
 import os
-import matplotlib.font_manager as fm
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
-import pandas as pd
+import string
+from functools import lru_cache
+
+import streamlit as st
 import numpy as np
-from datetime import date
 
 # Import the translations from the external file
-from irrigation_app_translations import TRANSLATIONS
-
-# Choose good Unicode-aware system fonts as fallbacks
-matplotlib.rcParams['font.family'] = ['DejaVu Sans', 'Arial Unicode MS', 'Tahoma', 'sans-serif']
-matplotlib.rcParams['axes.unicode_minus'] = False  # For minus sign display
+from irrigation_app_translations import TRANSLATIONS, get_label
+import irrigation_app_model as model
+from irrigation_app_cache import artifact_key, get_artifact_cache
+from irrigation_app_coalesce import coalescer, coalescing_stats
+from irrigation_app_goalseek import TARGETS, goal_seek, solvable
+from irrigation_app_graph import CostGraph
+from irrigation_app_results_table import lookup_results
+from irrigation_app_sessions import current_session_id, get_session_store
+from irrigation_app_state import RESULT_PARAM, STATE_PARAM, decode_inputs, encode_inputs
+
+# pandas, matplotlib and the portfolio page are imported where they are used,
+# so the page's first run does not load them; check with irrigation_app_import_budget.py
+
+# Result charts: 'vega' sends the values to the browser as Vega-Lite specs,
+# 'matplotlib' rasterizes PNGs on the server (see irrigation_app_chart_benchmark.py)
+CHART_RENDERER = os.environ.get('IRRIGATION_CHART_RENDERER', 'vega')
+CHART_SERIES = [('Cost_k', 'chart_cost'), ('Water', 'chart_water'), ('CO2', 'chart_co2')]
 
 # ---------- TEXT SANITIZER FOR PDF ----------
 def latin1_sanitize(text):
@@ -81,7 +91,8 @@ def apply_styles():
         section[data-testid='stSidebar'] .stTextInput label,
         section[data-testid='stSidebar'] .stSelectbox label,
         section[data-testid='stSidebar'] .stNumberInput label,
-        section[data-testid='stSidebar'] .stSlider label {
+        section[data-testid='stSidebar'] .stSlider label,
+        section[data-testid='stSidebar'] .stRadio label {
             color: white !important;
             font-size: 14px !important;
             font-weight: 500 !important;
@@ -215,92 +226,18 @@ def apply_styles():
         unsafe_allow_html=True
     )
 
-# ---------- CONSTANTS ----------
-ET_DATA = {
-    "Bangkok": 1280,
-    "Jakarta": 1235,
-    "Kuala Lumpur": 1300,
-    "Manila": 1370,
-    "Singapore": 1200,
-    "Hanoi": 1300,
-    "Ho Chi Minh City": 1500,
-    "Tokyo": 1100,
-    "Seoul": 1050,
-    "Dubai": 2100,
-    "Mexico City": 950,
-    "São Paulo": 1250,
-    "Buenos Aires": 1000,
-    "Beijing": 980,
-    "Shanghai": 1050,
-    "Guangzhou": 1150,
-    "Shenzhen": 1200,
-    "Chengdu": 1000,
-    "Wuhan": 1020,
-    "Xi'an": 970,
-    "Hangzhou": 1100,
-    "Nanjing": 1080,
-    "Tianjin": 990
-}
-UNIT_MULTIPLIERS = {"m²": 1, "Rai": 1600, "Hectare": 10000, "Acre": 4046.86}
-EXCHANGE_RATES_FALLBACK = {
-    'MXN': 0.5,
-    'BRL': 0.19,
-    'ARS': 25.0,
-    'JPY': 4.5,
-    'KRW': 38.0,
-    'AED': 0.1,
-    'USD': 0.029, 
-    'SGD': 0.038, 
-    'THB': 1.0, 
-    'VND': 735.0, 
-    'IDR': 500.0, 
-    'PHP': 1.5
-}
-
-# Define the construction cost coefficients for each city
-updated_city_coefficients_reviewed = {
-    "Bangkok": 2.0,
-    "Jakarta": 2.5,
-    "Kuala Lumpur": 2.5,
-    "Manila": 4,
-    "Singapore": 6,
-    "Hanoi": 1.8,
-    "Ho Chi Minh City": 2,
-    "Tokyo": 6.5,
-    "Seoul": 6.5,
-    "Dubai": 6.5,
-    "Mexico City": 2,
-    "São Paulo": 4,
-    "Buenos Aires": 3.6,
-    "Beijing": 4.5,
-    "Shanghai": 4.5,
-    "Guangzhou": 4.5,
-    "Shenzhen": 4,
-    "Chengdu": 4,
-    "Wuhan": 4,
-    "Xi'an": 4,
-    "Hangzhou": 4,
-    "Nanjing": 4,
-    "Tianjin": 4
-}
-
-
-
 # ---------------------------- Initialize Session State ----------------------------
 def initialize_session_state():
     if 'inputs' not in st.session_state:
         st.session_state.inputs = {'client': '', 'unit': 'm²', 'area': 1000.0, 'city': 'Bangkok', 'years': 3, 'currency': 'THB', 'water_price': 10.5}
     if 'lang' not in st.session_state:
         st.session_state.lang = 'English'  # Default language
-    if 'calc_results' not in st.session_state:
-        st.session_state.calc_results = {}
-    if 'city_coefficient' not in st.session_state:
-        st.session_state.city_coefficient = 1.0  # Initialize city coefficient to 1.0 as default
 
 
 # ---------- SIDEBAR INPUTS ----------
 def get_inputs():
     apply_styles()
+    data = model.current()
 
     # Initialize session_state if not already
     initialize_session_state()
@@ -334,11 +271,11 @@ def get_inputs():
     comp_method_display = st.selectbox("", options=[labels['method_auto'], labels['method_etbased']], key='comparison_method')
 
     # 4. Continue with other inputs, using translated labels for the remaining fields
-    unit = st.selectbox(labels['input_unit'], list(UNIT_MULTIPLIERS.keys()), index=list(UNIT_MULTIPLIERS.keys()).index(st.session_state.inputs['unit']))
+    unit = st.selectbox(labels['input_unit'], list(data.UNIT_MULTIPLIERS.keys()), index=list(data.UNIT_MULTIPLIERS.keys()).index(st.session_state.inputs['unit']))
     area = st.number_input(labels['input_area'], min_value=0.0, value=st.session_state.inputs['area'])
-    city = st.selectbox(labels['input_city'], list(ET_DATA.keys()), index=list(ET_DATA.keys()).index(st.session_state.inputs['city']))
-    years = st.slider(labels['input_years'], 1, 50, st.session_state.inputs['years'])
-    currency = st.selectbox(labels['input_currency'], list(EXCHANGE_RATES_FALLBACK.keys()), index=list(EXCHANGE_RATES_FALLBACK.keys()).index(st.session_state.inputs['currency']))
+    city = st.selectbox(labels['input_city'], list(data.ET_DATA.keys()), index=list(data.ET_DATA.keys()).index(st.session_state.inputs['city']))
+    years = st.slider(labels['input_years'], 1, data.MAX_YEARS, st.session_state.inputs['years'])
+    currency = st.selectbox(labels['input_currency'], list(data.EXCHANGE_RATES_FALLBACK.keys()), index=list(data.EXCHANGE_RATES_FALLBACK.keys()).index(st.session_state.inputs['currency']))
     water_price = st.number_input(labels['input_water_cost'], min_value=0.0, value=st.session_state.inputs['water_price'])
 
     # Save inputs to session state
@@ -352,76 +289,66 @@ def get_inputs():
 
 # ---------- CALCULATE COSTS ----------
 @st.cache_data
-def calculate_costs(area, unit, years, city, price, currency):
-    if city not in ET_DATA:
+def calculate_costs(area, unit, years, city, price, currency, plant_mix=None, escalation=None, tariff=None,
+                    lifecycle=False, data_version=None, _data=None, _graph=None):
+    # data_version keys the cache to the reference data; _data is that snapshot (not hashed).
+    # _graph is the session's CostGraph, which only reruns the model stages downstream of
+    # the inputs that changed since its last evaluation; without one, every stage runs.
+    data = _data or model.current()
+    if city not in data.ET_DATA:
         st.error(f"City '{city}' not found in ET data. Please select a valid city.")
-        return None, None, None, None, None
+        return None, None, None, None, None, None, None
 
-    # Get the infrastructure coefficient for the selected city
-    city_coefficient = updated_city_coefficients_reviewed.get(city, 1.0)
+    # Returns usage_per_year, usage, total, capital, opex_per_year, co2_per_year, co2 as {method: value}
+    return (_graph or CostGraph()).evaluate(area, unit, years, city, price, currency, plant_mix, escalation, tariff,
+                                            lifecycle, data)
 
-    # Store city_coefficient in session_state for later use
-    st.session_state.city_coefficient = city_coefficient  # Store it for later use in the summary
 
-    et_mm = ET_DATA[city]
-    m2 = area * UNIT_MULTIPLIERS[unit]
-    et_m3 = et_mm * m2 / 1000
-
-    # Calculate water usage per year for each method
-    usage_per_year = {
-        'Manual': et_m3 * 6,
-        'Truck': et_m3 * 8,
-        'Auto': et_m3 * 1.3,
-        'ET-Based': et_m3 * 1.0
-    }
+# Argument names of calculate_costs that identify a result in the shared store
+CALC_INPUTS = ('area', 'unit', 'years', 'city', 'price', 'currency', 'plant_mix', 'escalation', 'tariff', 'lifecycle')
 
-    # Calculate the total water usage across all methods for the given years
-    usage = {m: round(v * years, 2) for m, v in usage_per_year.items()}
 
-    # Base capital costs for each method
-    bases = {'Manual': 613006, 'Truck': 2160000, 'Auto': 280901.4, 'ET-Based': 280901.4}
+def shared_results(calc_args, data, graph=None):
+    """(result key, calculate_costs results) through the shared artifact store.
 
-    # Exchange rate for currency conversion
-    rate = EXCHANGE_RATES_FALLBACK[currency]
-
-    # Adjust capital costs by multiplying with the city coefficient
-    capital = {m: round(bases[m] * (m2 / UNIT_MULTIPLIERS['Rai']) * rate * city_coefficient, 2) for m in bases}
-
-    # Operational costs
-    labor_cost = 0.4
-    electricity_cost = 0.3
-    water_cost_ratio = 0.3
-
-    # Calculate operational expenses per year for each method
-    opex_per_year = {m: round(usage_per_year[m] * price * (labor_cost + electricity_cost + water_cost_ratio), 2) for m in usage_per_year}
+    Results are stored as JSON under a content key of the inputs and the data
+    version, in the artifact directory every server process uses, so a result
+    computed by one replica is read by the others instead of recomputed.
+    Standard scenarios are read from the materialized results table; anything
+    else runs the model through the session's graph (only the stages whose
+    inputs changed), and identical requests from concurrent sessions of this
+    process share one in-flight computation.
+    """
+    inputs = dict(zip(CALC_INPUTS, calc_args))
 
-    # Calculate total operational expenses over the given number of years
-    opex = {m: round(opex_per_year[m] * years, 2) for m in opex_per_year}
+    def build():
+        results = lookup_results(*calc_args[:len(CALC_INPUTS)], data=data)
+        if results is None:
+            results = coalescer('calculate_costs').do(
+                calc_args, lambda: calculate_costs(*calc_args, _data=data, _graph=graph)
+            )
+        return json.dumps(results).encode('utf-8')
 
-    # Total cost is capital plus operational expenses
-    total = {m: round(capital[m] + opex_per_year[m] * years, 2) for m in usage_per_year}
+    return artifact_key('calc', inputs, data), json.loads(get_artifact_cache().get_or_create('calc', inputs, build, data))
 
-    # Store results in session state for further use
-    st.session_state.calc_results = {
-        'usage_per_year': usage_per_year,
-        'usage': usage,
-        'total': total,
-        'capital': capital,
-        'opex_per_year': opex_per_year
-    }
 
-    # Return all calculated values
-    return usage_per_year, usage, total, capital, opex_per_year
+# ---------------------------- Matplotlib and Chart Setup ----------------------------
+def _pyplot():
+    """Import pyplot on first use and apply the chart font settings."""
+    import matplotlib
+    import matplotlib.pyplot as plt
 
+    # Force Matplotlib to use English labels and font
+    matplotlib.rcParams['axes.unicode_minus'] = False  # Prevent issues with negative signs
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+    return plt
 
-# ---------------------------- Matplotlib and Chart Setup ----------------------------
-# Force Matplotlib to use English labels and font
-matplotlib.rcParams['axes.unicode_minus'] = False  # Prevent issues with negative signs
-matplotlib.rcParams['font.family'] = 'DejaVu Sans'  
 
 # Function to render charts
 def render_charts(df, currency):
     """Render the Matplotlib charts with all text in English and proper number formatting."""
+    plt = _pyplot()
+    from matplotlib.ticker import FuncFormatter
 
     # Explicitly set English labels for all chart titles and axes
     english_labels = {
@@ -482,6 +409,44 @@ def render_charts(df, currency):
 
     return fig1, fig2, fig3
 
+
+def chart_specs(df, labels, currency):
+    """Vega-Lite specs for the cost, water and CO₂ bar charts, drawn in the browser.
+
+    Only the method names (already translated in df['Method']) and values are
+    sent, so the charts are localized without any server-side font handling.
+    """
+    specs = []
+    for column, label_key in CHART_SERIES:
+        title = get_label(labels, label_key)
+        if column == 'Cost_k':
+            title = f"{title} – {currency}"
+        specs.append({
+            'title': title,
+            'data': {'values': [{'method': m, 'value': v} for m, v in zip(df['Method'].tolist(), df[column].tolist())]},
+            'mark': {'type': 'bar', 'color': '#00703c', 'tooltip': True},
+            'encoding': {
+                'x': {'field': 'method', 'type': 'nominal', 'sort': None, 'title': None, 'axis': {'labelAngle': 0}},
+                'y': {'field': 'value', 'type': 'quantitative', 'title': None, 'axis': {'format': ',.2f'}}
+            }
+        })
+    return specs
+
+
+def show_charts(df, labels, currency):
+    """Result charts in tabs, with the renderer chosen by CHART_RENDERER."""
+    tabs = st.tabs([get_label(labels, key) for _, key in CHART_SERIES])
+    if CHART_RENDERER == 'matplotlib':
+        figures = render_charts(df.copy(), currency)  # render_charts overwrites the method names
+        for tab, fig in zip(tabs, figures):
+            with tab:
+                st.pyplot(fig)
+            _pyplot().close(fig)
+        return
+    for tab, spec in zip(tabs, chart_specs(df, labels, currency)):
+        with tab:
+            st.vega_lite_chart(spec, use_container_width=True)
+
     
 # Add a table that displays the cost, water usage, and CO2 reduction data with proper units
 def display_table(df, labels, currency):
@@ -496,22 +461,196 @@ def display_table(df, labels, currency):
 
 
 
-def get_label(labels, key, fallback_lang="English"):
-    """Return the label if available, else fallback to English."""
-    if key in labels:
-        return labels[key]
-    else:
-        # Fallback to English if the label is missing
-        return TRANSLATIONS[fallback_lang].get(key, key)
-    
+@lru_cache(maxsize=None)
+def summary_template(lang):
+    """Overview markup for one language, compiled once.
+
+    Every translated label and info icon is rendered in; only the
+    per-calculation slots ({city}, {annual_savings:,.2f}, ...) are left as
+    str.format fields, so the same template also serves PDF and static exports.
+    """
+    labels = TRANSLATIONS[lang]
+
+    def label(key):
+        return get_label(labels, key).replace('{', '{{').replace('}', '}}')
+
+    def icon(key):
+        return info_icon(key, labels).replace('{', '{{').replace('}', '}}')
+
+    return f"""
+                <div style='background-color:#e6f4ea;padding:5px 5px;border-radius:10px;margin-bottom:50px;'>
+                    <h3 style='color:#004d24;font-weight: 700; text-align:center;'>{label('savings_and_sustainability')}</h3>
+                    <p style='font-size: 14px; color:#004d24; line-height:1.6;'>
+                        {label('annual_savings_description')}
+                        <strong>{{base_method}}</strong> {label('vs')} <strong>{{comp_method}}</strong>
+                        {label('long_term_planning')}
+                    </p>
+                    <!-- Summary of input data used in calculations -->
+                    <div style="margin-top: 5px; font-size: 14px; color:#004d24;">
+                        <strong>{label('input_data_summary')}</strong>:
+                        <ul>
+                            <li><strong>{label('input_city')}:</strong> {{city}}</li>
+                            <li><strong>{label('input_area')}:</strong> {{area}} {{unit}}</li>
+                            <li><strong>{label('input_currency')}:</strong> {{currency}}</li>
+                            <li><strong>{label('input_water_cost')}:</strong> {{water_cost}}</li>
+                            <li><strong>{label('input_years')}:</strong> {{years}} {label('years')}</li>
+                            <li><strong>{label('base_method')}:</strong> {{base_method}}</li>
+                            <li><strong>{label('comparison_method')}:</strong> {{comp_method}}</li>
+                            <li><strong>{label('construction_coefficient')}:</strong> {{city_coefficient}} (Coefficient for {{city}})</li>
+                            <li><strong>{label('landscape_coefficient')}:</strong> {{kc:.2f}}</li>
+                        </ul>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('annual_savings')} {icon('annual_savings_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{{currency}} {{annual_savings:,.2f}} / year</p>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('total_savings')} {icon('total_savings_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{{currency}} {{total_savings:,.2f}} / {{years}} {label('input_years')}</p>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('capex_diff')} {icon('capex_difference_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{{currency}} {{capex_diff:,.2f}}</p>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('payback')} {icon('payback_period_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{{payback}} {label('input_years')}</p>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('co2_saving')} {icon('co2_reduction_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{{co2_saving:,.2f}} tons</p>
+                    </div>
+                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
+                        <h4 style='font-weight: bold; color: #00703c;'>
+                            {label('water_efficiency')} {icon('water_efficiency_info')}
+                        </h4>
+                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>Enhanced</p>
+                    </div>
+                </div>
+                    <div style='margin-top: -50px;'margin-bottom: 50px; text-align: left;'>
+                        <h4 style='color:#004d24; font-weight: 700;'>{label('key_benefits')}</h4>
+                        <ul style='list-style: none; padding-left: 0; font-size: 14px;'>
+                            <li>🔑 <strong>{label('water_efficiency_benefit')}</strong></li>
+                            <li>🌍 <strong>{label('environmental_impact_benefit')}</strong></li>
+                            <li>💡 <strong>{label('operational_efficiency_benefit')}</strong></li>
+                        </ul>
+                    </div>
+                </div>
+                """
+
+
+@lru_cache(maxsize=None)
+def _summary_parts(lang):
+    # (static markup, slot name or None, format spec); str.format would rescan the whole template each time
+    return tuple((text, name, spec) for text, name, spec, _ in string.Formatter().parse(summary_template(lang)))
+
+
+def results_summary_html(lang, base_method, comp_method, city, area, unit, currency, water_cost, years,
+                         city_coefficient, kc, annual_savings, total_savings, capex_diff, payback, co2_saving):
+    """Savings and sustainability overview markup for one calculation."""
+    values = {
+        'base_method': base_method, 'comp_method': comp_method, 'city': city, 'area': area, 'unit': unit,
+        'currency': currency, 'water_cost': water_cost, 'years': years, 'city_coefficient': city_coefficient,
+        'kc': kc, 'annual_savings': annual_savings, 'total_savings': total_savings, 'capex_diff': capex_diff,
+        'payback': payback, 'co2_saving': co2_saving
+    }
+    out = []
+    for text, name, spec in _summary_parts(lang):
+        out.append(text)
+        if name is not None:
+            out.append(format(values[name], spec))
+    return ''.join(out)
+
+
+# Label of each goal-seek unknown
+GOAL_SEEK_INPUTS = {'water_price': 'input_water_cost', 'area': 'input_area', 'years': 'input_years',
+                    'coefficient': 'city_coefficient'}
+
+
+@st.fragment
+def render_goal_seek(labels, calc_args, base_method, comp_method, data):
+    """Break-even input for the shown scenario; reruns on its own, so the results above stay."""
+    area, unit, years, city, price, currency, plant_mix, escalation, tariff, lifecycle = calc_args[:10]
+    with st.expander(get_label(labels, 'goal_seek_title'), expanded=False):
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            target = st.selectbox(get_label(labels, 'goal_seek_target'), TARGETS,
+                                  format_func=lambda t: get_label(labels, t))
+        with c2:
+            value = st.number_input(get_label(labels, 'goal_seek_value'), value=3.0 if target == 'payback' else 10000.0,
+                                    step=1.0 if target == 'payback' else 1000.0, key=f'goal_seek_{target}')
+        with c3:
+            unknown = st.selectbox(get_label(labels, 'goal_seek_solve'), solvable(target, tariff, lifecycle),
+                                   format_func=lambda u: get_label(labels, GOAL_SEEK_INPUTS[u]))
+        solved = goal_seek(unknown, target, value, area, unit, years, city, price, currency, base_method, comp_method,
+                           escalation_rates=dict(escalation) if escalation else None, tariff=tariff,
+                           lifecycle=lifecycle, kc=model.plant_mix_kc(plant_mix, data), data=data)[0]
+        if np.isnan(solved):
+            st.info(get_label(labels, 'goal_seek_none'))
+            return
+        shown = {
+            'water_price': f"{currency} {solved:,.2f} / m³",
+            'area': f"{solved:,.1f} {unit}",
+            'years': f"{int(solved)}",
+            'coefficient': f"{solved:.3f}",
+        }[unknown]
+        st.metric(get_label(labels, GOAL_SEEK_INPUTS[unknown]), shown)
+
 
 def main():
     # Initialize session state before using it
     initialize_session_state()
 
+    # One reference data snapshot for the whole run; edits to the data file are
+    # picked up by the watcher and show from the next run on
+    model.start_data_watcher()
+    data = model.current()
+
+    # Inputs from the page URL (a reload, a shared link or another server process),
+    # read once per session so the widget defaults stay fixed afterwards
+    if 'url_inputs' not in st.session_state:
+        st.session_state.url_inputs = decode_inputs(st.query_params.get(STATE_PARAM), data, TRANSLATIONS)
+        st.session_state.lang = st.session_state.url_inputs['lang']
+        st.session_state.restore_result = st.query_params.get(RESULT_PARAM)
+    restored = st.session_state.url_inputs
+
     # Apply styles (unchanged)
     apply_styles()
 
+    # Memory accounting for this session; idle sessions' payloads are evicted
+    session_store = get_session_store()
+    session_id = current_session_id()
+    session_store.touch(session_id, st.session_state)
+
+    # Coalescing and session memory statistics for operators, shown with ?stats=1
+    if st.query_params.get('stats'):
+        with st.sidebar.expander('Coalescing stats', expanded=True):
+            st.json(coalescing_stats())
+        with st.sidebar.expander('Session memory', expanded=True):
+            st.json(session_store.stats())
+        graph = session_store.get(session_id, 'cost_graph')
+        if graph is not None:
+            with st.sidebar.expander('Model graph', expanded=True):
+                st.json(graph.stats())
+
+    # Page selection: single-site calculator or portfolio upload
+    page_labels = TRANSLATIONS[st.session_state.lang]
+    pages = [get_label(page_labels, 'page_calculator'), get_label(page_labels, 'page_portfolio')]
+    if st.sidebar.radio(get_label(page_labels, 'page_select'), pages, key='page') == pages[1]:
+        from irrigation_app_portfolio import render_portfolio_page
+        render_portfolio_page(page_labels)
+        return
+
     col1, col2 = st.columns([1.1, 1.5], gap='large')  # Define col1 and col2
 
     with col1:
@@ -519,7 +658,7 @@ def main():
         lang = st.selectbox(
             get_label(TRANSLATIONS[st.session_state.lang], 'input_language'),
             list(TRANSLATIONS.keys()),
-            index=list(TRANSLATIONS.keys()).index(st.session_state.lang)
+            index=list(TRANSLATIONS.keys()).index(st.session_state.lang), key='language'
         )
 
         # Update session language state when changed
@@ -543,23 +682,82 @@ def main():
         # >>>>>>>>>>>> MOVE THIS UP <<<<<<<<<<<<<<
 
         # Project inputs with translated labels
-        city = st.selectbox(get_label(labels, 'input_city'), options=list(ET_DATA.keys()), index=0)
-        unit = st.selectbox(get_label(labels, 'input_unit'), options=list(UNIT_MULTIPLIERS.keys()), index=0)
-        area = st.number_input(get_label(labels, 'input_area'), min_value=0.0, value=1600.0)
-        years = st.slider(get_label(labels, 'input_years'), min_value=1, max_value=30, value=3)
-        currency = st.selectbox(get_label(labels, 'input_currency'), options=list(EXCHANGE_RATES_FALLBACK.keys()), index=0)
-        water_price = st.number_input(get_label(labels, 'input_water_cost'), min_value=0.0, value=10.5)
-        client = st.text_input(get_label(labels, 'input_client'), "Unnamed Project")
+        city = st.selectbox(get_label(labels, 'input_city'), options=list(data.ET_DATA.keys()),
+                            index=list(data.ET_DATA.keys()).index(restored['city']), key='city')
+        unit = st.selectbox(get_label(labels, 'input_unit'), options=list(data.UNIT_MULTIPLIERS.keys()),
+                            index=list(data.UNIT_MULTIPLIERS.keys()).index(restored['unit']), key='unit')
+        area = st.number_input(get_label(labels, 'input_area'), min_value=0.0, value=float(restored['area']), key='area')
+        years = st.slider(get_label(labels, 'input_years'), min_value=1, max_value=data.MAX_YEARS, value=restored['years'],
+                          key='years')
+        currency = st.selectbox(get_label(labels, 'input_currency'), options=list(data.EXCHANGE_RATES_FALLBACK.keys()),
+                                index=list(data.EXCHANGE_RATES_FALLBACK.keys()).index(restored['currency']), key='currency')
+        water_price = st.number_input(get_label(labels, 'input_water_cost'), min_value=0.0, value=float(restored['water_price']),
+                                      key='water_price')
+
+        # Optional block tariff; the flat water price above is used when none is selected
+        flat_label = get_label(labels, 'tariff_flat')
+        tariff_options = [flat_label] + list(data.WATER_TARIFFS.keys())
+        tariff_choice = st.selectbox(
+            get_label(labels, 'input_tariff'), options=tariff_options,
+            index=tariff_options.index(restored['tariff']) if restored['tariff'] else 0,
+            help=f"{city}: {data.CITY_TARIFFS.get(city, flat_label)}"
+        )
+        tariff = None if tariff_choice == flat_label else tariff_choice
+
+        # Planting mix: one type covers the whole area, several types get an area share each
+        restored_shares = dict(restored['plant_mix'] or ())
+        plant_types = st.multiselect(get_label(labels, 'input_landscape'), options=list(data.KC_DATA.keys()),
+                                     default=list(restored_shares) or ['Reference'])
+        plant_mix = None
+        if len(plant_types) == 1 and plant_types[0] != 'Reference':
+            plant_mix = ((plant_types[0], 1.0),)
+        elif len(plant_types) > 1:
+            share_cols = st.columns(len(plant_types))
+            shares = []
+            for share_col, plant in zip(share_cols, plant_types):
+                with share_col:
+                    shares.append(st.number_input(
+                        f"{plant} – {get_label(labels, 'landscape_share')}",
+                        min_value=0.0, max_value=100.0,
+                        value=round(restored_shares[plant] * 100, 1) if plant in restored_shares else round(100 / len(plant_types), 1),
+                        key=f'plant_share_{plant}'
+                    ))
+            if sum(shares) > 0:
+                plant_mix = tuple((plant, share / 100) for plant, share in zip(plant_types, shares))
+
+        # Yearly escalation of prices and ET over the horizon (all zero = flat)
+        with st.expander(get_label(labels, 'escalation_title'), expanded=False):
+            esc_cols = st.columns(len(data.ESCALATION_RATES))
+            escalation_pct = {}
+            restored_pct = restored['escalation_pct'] or {}
+            for esc_col, part in zip(esc_cols, data.ESCALATION_RATES):
+                with esc_col:
+                    escalation_pct[part] = st.number_input(
+                        get_label(labels, f'escalation_{part}'), min_value=-20.0, max_value=50.0,
+                        value=float(restored_pct.get(part, np.atleast_1d(data.ESCALATION_RATES[part])[0] * 100)), step=0.5,
+                        key=f'escalation_{part}'
+                    )
+        escalation = tuple((part, pct / 100) for part, pct in escalation_pct.items()) if any(escalation_pct.values()) else None
+
+        # Count controller, sensor, truck, ... replacements within the period
+        lifecycle = st.checkbox(get_label(labels, 'input_lifecycle'), value=restored['lifecycle'])
+
+        client = st.text_input(get_label(labels, 'input_client'), restored['client'])
         c1, c2 = st.columns(2)
         with c1:
-            base_method_display = st.selectbox(get_label(labels, 'base_method'), options=list(method_map.values()), key='base_method')
+            base_options = list(method_map.values())
+            base_method_display = st.selectbox(get_label(labels, 'base_method'), options=base_options, key='base_method',
+                                               index=base_options.index(method_map[restored['base_method']]))
         with c2:
-            comp_method_display = st.selectbox(get_label(labels, 'comparison_method'), options=[get_label(labels, 'method_auto'), get_label(labels, 'method_etbased')], key='comparison_method')
+            comp_options = [get_label(labels, 'method_auto'), get_label(labels, 'method_etbased')]
+            comp_method_display = st.selectbox(get_label(labels, 'comparison_method'), options=comp_options, key='comparison_method',
+                                               index=comp_options.index(method_map[restored['comp_method']])
+                                               if method_map[restored['comp_method']] in comp_options else 0)
 
 
         # Add the "Calculate" button with an emoji at the bottom of col1
         st.markdown("<br>", unsafe_allow_html=True)  # Add some space above the button
-        calculate_button = st.button(labels['calculate_button'], use_container_width=True)
+        calculate_button = st.button(labels['calculate_button'], use_container_width=True, key='calculate')
         st.markdown(
             """
             <div style="font-size: 16px; color: #004d24; text-align: center; margin-top: 5x;">
@@ -589,124 +787,79 @@ def main():
         base_method = method_map_rev.get(base_method_display, 'Manual')
         comp_method = method_map_rev.get(comp_method_display, 'Auto')
 
-        if calculate_button:
+        # Keep the inputs in the URL so any server process can rebuild this page
+        url_token = encode_inputs({
+            'lang': st.session_state.lang, 'city': city, 'unit': unit, 'area': area, 'years': years,
+            'currency': currency, 'water_price': water_price, 'tariff': tariff, 'plant_mix': plant_mix,
+            'escalation_pct': escalation_pct if any(escalation_pct.values()) else None, 'lifecycle': lifecycle,
+            'client': client, 'base_method': base_method, 'comp_method': comp_method
+        })
+        if st.query_params.get(STATE_PARAM, '') != url_token:
+            st.query_params[STATE_PARAM] = url_token
+
+        # Results show after Calculate, and on the first run of a link that carried a result key
+        restore_result = st.session_state.pop('restore_result', None)
+        if calculate_button or restore_result:
             # Ensure that costs are calculated first when the button is pressed
-            usage_per_year, usage, total, capital, opex_per_year = calculate_costs(
-                area, unit, years, city, water_price, currency
-            )
+            calc_args = (area, unit, years, city, water_price, currency, plant_mix, escalation, tariff, lifecycle,
+                         data.version)
+            graph = session_store.get(session_id, 'cost_graph')
+            if graph is None:
+                graph = CostGraph()
+            result_key, results = shared_results(calc_args, data, graph)
+            # Stored once evaluated, so the store measures the graph with its filled memo
+            session_store.put(session_id, 'cost_graph', graph)
+            usage_per_year, usage, total, capital, opex_per_year, co2_per_year, co2 = results
+            st.query_params[RESULT_PARAM] = result_key
+            city_coefficient = data.updated_city_coefficients_reviewed.get(city, 1.0)
+            water_cost = tariff or f"{water_price} / m³"
+            kc = model.plant_mix_kc(plant_mix, data)
 
             # Calculate savings and metrics
             annual_savings = round(opex_per_year[base_method] - opex_per_year[comp_method], 2) if base_method != comp_method else 0
-            total_savings = annual_savings * years
+            if escalation or lifecycle:
+                # Escalated opex and replacements are not flat per year, so take the horizon totals directly
+                total_savings = round((total[base_method] - capital[base_method]) - (total[comp_method] - capital[comp_method]), 2)
+            else:
+                total_savings = annual_savings * years
             capex_diff = capital[base_method] - capital[comp_method]
             payback = f"{round(capex_diff / annual_savings, 1)}" if (annual_savings > 0 and capex_diff > 0) else 'N/A'
-            co2_saving = round((usage_per_year[base_method] - usage_per_year[comp_method]) * years * 0.5, 2) if base_method != comp_method else 0
-
-            # Save results to session state
-            st.session_state.calc_results = {
-                'usage_per_year': usage_per_year,
-                'usage': usage,
-                'total': total,
-                'capital': capital,
-                'opex_per_year': opex_per_year,
-                'annual_savings': annual_savings,
-                'total_savings': total_savings,
-                'capex_diff': capex_diff,
-                'payback': payback,
-                'co2_saving': co2_saving,
-                'currency': currency,  # Store selected currency in session state
-                'client': client,  # Store client name in session state
-                'city': city,  # Store city in session state
-                'area': area,  # Store area in session state
-                'unit': unit,  # Store unit in session state
-                'years': years  # Store years in session state
-            }
+            co2_saving = round((co2[base_method] - co2[comp_method]) / 1000, 2) if base_method != comp_method else 0
 
             # Display the savings and sustainability overview using translated terms
-            st.markdown(
-                f"""
-                <div style='background-color:#e6f4ea;padding:5px 5px;border-radius:10px;margin-bottom:50px;'>
-                    <h3 style='color:#004d24;font-weight: 700; text-align:center;'>{get_label(labels, 'savings_and_sustainability')}</h3>
-                    <p style='font-size: 14px; color:#004d24; line-height:1.6;'>
-                        {get_label(labels, 'annual_savings_description')}
-                        <strong>{base_method}</strong> {get_label(labels, 'vs')} <strong>{comp_method}</strong>
-                        {get_label(labels, 'long_term_planning')}
-                    </p>
-                    <!-- Summary of input data used in calculations -->
-                    <div style="margin-top: 5px; font-size: 14px; color:#004d24;">
-                        <strong>{get_label(labels, 'input_data_summary')}</strong>:
-                        <ul>
-                            <li><strong>{get_label(labels, 'input_city')}:</strong> {city}</li>
-                            <li><strong>{get_label(labels, 'input_area')}:</strong> {area} {unit}</li>
-                            <li><strong>{get_label(labels, 'input_currency')}:</strong> {currency}</li>
-                            <li><strong>{get_label(labels, 'input_water_cost')}:</strong> {water_price} / m³</li>
-                            <li><strong>{get_label(labels, 'input_years')}:</strong> {years} {get_label(labels, 'years')}</li>
-                            <li><strong>{get_label(labels, 'base_method')}:</strong> {base_method}</li>
-                            <li><strong>{get_label(labels, 'comparison_method')}:</strong> {comp_method}</li>
-                            <li><strong>{get_label(labels, 'construction_coefficient')}:</strong> {st.session_state.city_coefficient} (Coefficient for {city})</li>
-                        </ul>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'annual_savings')} {info_icon('annual_savings_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{currency} {annual_savings:,.2f} / year</p>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'total_savings')} {info_icon('total_savings_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{currency} {total_savings:,.2f} / {years} {get_label(labels, 'input_years')}</p>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'capex_diff')} {info_icon('capex_difference_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{currency} {capex_diff:,.2f}</p>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'payback')} {info_icon('payback_period_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{payback} {get_label(labels, 'input_years')}</p>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'co2_saving')} {info_icon('co2_reduction_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>{co2_saving:,.2f} tons</p>
-                    </div>
-                    <div style='flex: 1; padding: 8px; min-width: 220px;'>
-                        <h4 style='font-weight: bold; color: #00703c;'>
-                            {get_label(labels, 'water_efficiency')} {info_icon('water_efficiency_info', labels)}
-                        </h4>
-                        <p style='font-size: 16px; color:#004d24; font-weight: 600;'>Enhanced</p>
-                    </div>
-                </div>
-                    <div style='margin-top: -50px;'margin-bottom: 50px; text-align: left;'>
-                        <h4 style='color:#004d24; font-weight: 700;'>{get_label(labels, 'key_benefits')}</h4>
-                        <ul style='list-style: none; padding-left: 0; font-size: 14px;'>
-                            <li>🔑 <strong>{get_label(labels, 'water_efficiency_benefit')}</strong></li>
-                            <li>🌍 <strong>{get_label(labels, 'environmental_impact_benefit')}</strong></li>
-                            <li>💡 <strong>{get_label(labels, 'operational_efficiency_benefit')}</strong></li>
-                        </ul>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            summary_key = ('results_html', st.session_state.lang, base_method, comp_method, city, area, unit, currency,
+                           water_cost, years, annual_savings, total_savings, capex_diff, payback, co2_saving, kc)
+            summary_html = coalescer('results_html').do(summary_key, lambda: results_summary_html(
+                st.session_state.lang, base_method, comp_method, city, area, unit, currency, water_cost, years,
+                city_coefficient, kc, annual_savings, total_savings, capex_diff, payback, co2_saving
+            ))
+            st.markdown(summary_html, unsafe_allow_html=True)
 
            
             # Create df with the relevant data for charts
+            import pandas as pd
             df = pd.DataFrame([{
                 'Method': get_label(labels, f'method_{m.lower().replace("-", "").replace(" ", "")}'),
                 'Cost_k': round(total[m] / 1000, 2),
                 'Water': round(usage_per_year[m], 2),
-                'CO2': round(usage_per_year[m] * 0.5 / 1000, 2)
+                'CO2': round(co2_per_year[m] / 1000, 2)
             } for m in usage_per_year])
 
             # Call the function to display the table with units
             display_table(df, labels, currency)
+            show_charts(df, labels, currency)
+
+            # CSV export, served from the artifact cache when these inputs were exported before
+            csv_inputs = {
+                'area': area, 'unit': unit, 'years': years, 'city': city, 'price': water_price, 'currency': currency,
+                'plant_mix': plant_mix, 'escalation': escalation, 'tariff': tariff, 'lifecycle': lifecycle,
+                'lang': st.session_state.lang
+            }
+            csv_data = get_artifact_cache().get_or_create(
+                'method_csv', csv_inputs, lambda: df.to_csv(index=False).encode('utf-8'), data
+            )
+            st.download_button(get_label(labels, 'download_csv'), csv_data, file_name=f"irrigation_{city}_{currency}.csv", mime='text/csv')
+            render_goal_seek(labels, calc_args, base_method, comp_method, data)
 
             st.markdown(
                 f"""
@@ -722,6 +875,9 @@ def main():
                 """,
                 unsafe_allow_html=True
             )
+        elif RESULT_PARAM in st.query_params:
+            # Results are no longer on the page once an input changed
+            del st.query_params[RESULT_PARAM]
 
 
 if __name__ == '__main__':
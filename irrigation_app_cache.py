@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import irrigation_app_model as model
+from irrigation_app_translations import TRANSLATIONS
+
+# ---------- ARTIFACT CACHE ----------
+# Charts, CSVs and reports built from the same inputs and data are stored here by content hash
+ARTIFACT_CACHE_DIR = os.environ.get(
+    'IRRIGATION_ARTIFACT_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.artifact_cache')
+)
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get('IRRIGATION_ARTIFACT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def _canonical(value):
+    """Normalize inputs so equal values hash equally (1600 == 1600.0, dict order, tuples vs lists)."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return repr(float(value))
+    if hasattr(value, 'tolist'):  # numpy scalars and arrays
+        return _canonical(value.tolist())
+    return str(value)
+
+
+def _digest(value):
+    payload = json.dumps(_canonical(value), ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+TRANSLATIONS_VERSION = _digest(TRANSLATIONS)[:16]
+
+
+def data_version(data):
+    """Version of a reference data snapshot plus the translation catalog.
+
+    Any edit to ET_DATA, updated_city_coefficients_reviewed, EXCHANGE_RATES_FALLBACK,
+    the method tables or TRANSLATIONS changes it, which changes every artifact key.
+    data is the model.ModelData the artifact is built from, so a hot reload
+    between building and storing cannot file it under the new version.
+    """
+    return f"{data.version}-{TRANSLATIONS_VERSION}"
+
+
+def artifact_key(kind, inputs, data):
+    """Content address of an artifact: its kind, the normalized inputs and the version of its data snapshot."""
+    return f"{kind}-{_digest({'kind': kind, 'inputs': inputs, 'data': data_version(data)})[:40]}"
+
+
+class ArtifactCache:
+    """Disk-backed artifact store with atomic writes and size-bounded LRU eviction.
+
+    Entries are files named by key; reads refresh the file's mtime, so eviction
+    (oldest mtime first) follows least-recent use across sessions and restarts.
+    The directory is scanned once, at startup; after that an in-memory index
+    of key -> size in use order, and its running total, decide what to evict.
+    Files written by other processes join the index when they are read.
+    """
+
+    def __init__(self, cache_dir=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self._total = 0
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.startswith('.'):
+                continue  # in-flight temp files
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+        with self._lock:
+            self._evict()
+
+    def _used(self, key, size):
+        # Caller holds the lock
+        self._total += size - self._index.pop(key, 0)
+        self._index[key] = size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._total -= self._index.pop(key, 0)  # removed by another process
+            return None
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass  # evicted meanwhile; the bytes we read are still valid
+        with self._lock:
+            self.hits += 1
+            self._used(key, len(data))
+        return data
+
+    def put(self, key, data):
+        tmp = self._path(f".{key}.{uuid.uuid4().hex}.tmp")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._used(key, len(data))
+            self._evict()
+
+    def get_or_create(self, kind, inputs, build, data):
+        """Cached bytes for (kind, inputs) built from the data snapshot, calling build() -> bytes on a miss."""
+        key = artifact_key(kind, inputs, data)
+        artifact = self.get(key)
+        if artifact is None:
+            artifact = build()
+            self.put(key, artifact)
+        return artifact
+
+    def _evict(self):
+        # Caller holds the lock
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass  # already removed by another process
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache():
+    """Process-wide artifact cache shared by all sessions."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+        return _cache
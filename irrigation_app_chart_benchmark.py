@@ -0,0 +1,72 @@
+# Server cost of the two result-chart renderers.
+#
+#   python irrigation_app_chart_benchmark.py [repeats]
+#
+# matplotlib: render_charts + PNG encoding the way st.pyplot does it (dpi 200,
+# tight bbox); the PNG bytes are what the browser downloads.
+# vega: chart_specs + the JSON/Arrow payload st.vega_lite_chart sends; the
+# browser draws the bars.
+import io
+import json
+import logging
+import sys
+import time
+
+
+def _sample_frame(pd, labels, usage_per_year, total, co2_per_year):
+    # Same frame main() builds for the method table
+    return pd.DataFrame([{
+        'Method': labels[f'method_{m.lower().replace("-", "").replace(" ", "")}'],
+        'Cost_k': round(total[m] / 1000, 2),
+        'Water': round(usage_per_year[m], 2),
+        'CO2': round(co2_per_year[m] / 1000, 2)
+    } for m in usage_per_year])
+
+
+def benchmark(repeats=20, lang='English'):
+    """{renderer: {'cpu_ms': per render, 'bytes': payload per render}}."""
+    logging.disable(logging.WARNING)  # bare-mode warnings when importing the page
+    import pandas as pd
+    from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+    import irrigation_app as app
+    from irrigation_app_translations import TRANSLATIONS
+
+    labels = TRANSLATIONS[lang]
+    usage_per_year, _, total, _, _, co2_per_year, _ = app.calculate_costs(1600.0, 'm²', 3, 'Bangkok', 10.5, 'THB')
+    df = _sample_frame(pd, labels, usage_per_year, total, co2_per_year)
+    plt = app._pyplot()
+    app.render_charts(df.copy(), 'THB')  # load fonts once; a warm server has them too
+    plt.close('all')
+
+    results = {}
+    start, payload = time.process_time(), 0
+    for _ in range(repeats):
+        for fig in app.render_charts(df.copy(), 'THB'):
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+            payload += buffer.tell()
+            plt.close(fig)
+    results['matplotlib'] = {'cpu_ms': (time.process_time() - start) / repeats * 1000, 'bytes': payload // repeats}
+
+    start, payload = time.process_time(), 0
+    for _ in range(repeats):
+        for spec in app.chart_specs(df, labels, 'THB'):
+            # Streamlit ships the values as an Arrow table next to the spec; count both
+            values = convert_pandas_df_to_arrow_bytes(pd.DataFrame(spec['data']['values']))
+            payload += len(json.dumps({k: v for k, v in spec.items() if k != 'data'}).encode()) + len(values)
+    results['vega'] = {'cpu_ms': (time.process_time() - start) / repeats * 1000, 'bytes': payload // repeats}
+    return results
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    results = benchmark(repeats)
+    print(f"{'renderer':<12}{'server CPU / render':>22}{'payload / render':>20}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['cpu_ms']:>19.1f} ms{r['bytes'] / 1024:>17.1f} KB")
+    ratio = results['matplotlib']['cpu_ms'] / max(results['vega']['cpu_ms'], 1e-6)
+    print(f"vega uses {ratio:,.0f}x less server CPU")
+
+
+if __name__ == '__main__':
+    main()
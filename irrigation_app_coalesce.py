@@ -0,0 +1,85 @@
+import threading
+
+# ---------- REQUEST COALESCING ----------
+# Identical requests arriving while the first one is still running wait for its
+# result instead of computing it again (single flight per key).
+
+
+class SingleFlight:
+    """Run fn once per key at a time; concurrent callers with the same key share the result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                call = self._in_flight.get(key)
+                leader = call is None
+                if leader:
+                    call = self._in_flight[key] = {'done': threading.Event(), 'result': None, 'error': None,
+                                                   'aborted': False}
+                    self.executions += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            call['done'].wait()
+            if call['aborted']:
+                # The leader was interrupted (e.g. its session reran or stopped); that is not
+                # this caller's to re-raise, so try again, possibly as the new leader
+                with self._lock:
+                    self.coalesced -= 1
+                continue
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+        except Exception as e:
+            call['error'] = e
+            raise
+        except BaseException:
+            call['aborted'] = True
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call['done'].set()
+        return call['result']
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight),
+                'saved_ratio': self.coalesced / self.calls if self.calls else 0.0
+            }
+
+
+_coalescers = {}
+_coalescers_lock = threading.Lock()
+
+
+def coalescer(name):
+    """Process-wide SingleFlight for one kind of work (e.g. 'calculate_costs')."""
+    with _coalescers_lock:
+        if name not in _coalescers:
+            _coalescers[name] = SingleFlight()
+        return _coalescers[name]
+
+
+def coalescing_stats():
+    """Stats per coalescer name: calls, executions, coalesced, in_flight, saved_ratio."""
+    with _coalescers_lock:
+        flights = dict(_coalescers)
+    return {name: flight.stats() for name, flight in flights.items()}
@@ -0,0 +1,192 @@
+# Reference tables shared by the Streamlit app and the batch cost model.
+# Kept free of Streamlit imports so batch jobs can load them directly.
+#
+# The tables themselves live in irrigation_app_data.json so they can be edited
+# on a running server: irrigation_app_model watches the file and swaps in a
+# new, validated snapshot without a restart.
+import hashlib
+import json
+import math
+import os
+
+# ---------- DATA FILE ----------
+DATA_FILE = os.environ.get(
+    'IRRIGATION_DATA_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'irrigation_app_data.json')
+)
+
+# ---------- TABLE FORMATS ----------
+# ET_DATA                             city -> annual reference ET (mm)
+# UNIT_MULTIPLIERS                    area unit -> m² per unit
+# EXCHANGE_RATES_FALLBACK             currency -> units per THB
+# CURRENCY_DECIMALS                   currency -> digits of its minor unit (ISO 4217: 2 for cents,
+#                                     0 for JPY, KRW, VND); money is rounded to it. Missing = 2
+# updated_city_coefficients_reviewed  city -> construction cost coefficient (1.0 when missing)
+#
+# USAGE_MULTIPLIERS                   method -> water use relative to city ET (ET-Based irrigates to ET exactly)
+# CAPITAL_BASES                       method -> capital cost (THB per Rai, before city coefficient)
+# OPEX_SHARES                         opex part -> share of usage * water price
+#
+# KC_DATA                             plant type -> one annual Kc or 12 monthly values (Jan..Dec);
+#                                     "Reference" keeps the old Kc = 1
+#
+# MAX_YEARS                           longest projection horizon offered in the UI (years)
+# ESCALATION_RATES                    water/labor/electricity/et -> constant annual rate or a list of
+#                                     per-year rates (year 1 -> 2, 2 -> 3, ...); zeros keep costs flat
+#
+# WATER_TARIFFS                       name -> {currency, period (monthly/annual), fixed charge per period,
+#                                     tiers: [[upper bound m³ per period, price per m³], ...]}, the last
+#                                     tier open-ended (null). Figures are illustrative.
+# CITY_TARIFFS                        city -> default tariff; cities not listed use the flat water price
+#
+# GRID_EMISSION_FACTORS               grid region -> kg CO₂ per kWh (approximate published averages)
+# CITY_GRID_REGIONS                   city -> grid region
+# DEFAULT_GRID_FACTOR                 factor for cities without a grid region (the old flat 0.5 kg CO₂ per m³)
+# GRID_DECARBONIZATION                region -> yearly change of its grid factor, same format as
+#                                     ESCALATION_RATES (e.g. -0.03 for 3% per year). Missing = flat
+# PUMPING_KWH_PER_M3                  method -> pumping electricity per m³ delivered
+# TRUCK_DIESEL_L_PER_M3               method -> diesel per m³ delivered
+# DIESEL_KG_CO2_PER_L                 kg CO₂ per litre of diesel
+#
+# METHOD_COMPONENTS                   method -> [[component, share of capital, lifetime in years], ...];
+#                                     a component is bought again each time its lifetime runs out
+#
+# Keys starting with "_" (such as "_notes") are ignored.
+TABLES = [
+    'ET_DATA', 'UNIT_MULTIPLIERS', 'EXCHANGE_RATES_FALLBACK', 'CURRENCY_DECIMALS', 'updated_city_coefficients_reviewed',
+    'USAGE_MULTIPLIERS', 'CAPITAL_BASES', 'OPEX_SHARES', 'KC_DATA', 'MAX_YEARS', 'ESCALATION_RATES',
+    'WATER_TARIFFS', 'CITY_TARIFFS', 'GRID_EMISSION_FACTORS', 'CITY_GRID_REGIONS', 'DEFAULT_GRID_FACTOR',
+    'GRID_DECARBONIZATION', 'PUMPING_KWH_PER_M3', 'TRUCK_DIESEL_L_PER_M3', 'DIESEL_KG_CO2_PER_L',
+    'METHOD_COMPONENTS'
+]
+METHOD_TABLES = ['USAGE_MULTIPLIERS', 'CAPITAL_BASES', 'PUMPING_KWH_PER_M3', 'TRUCK_DIESEL_L_PER_M3']
+# Tables that are single values; every other table is an object
+SCALAR_TABLES = ['MAX_YEARS', 'DEFAULT_GRID_FACTOR', 'DIESEL_KG_CO2_PER_L']
+# Entries the app and model refer to by name, which a data file has to keep
+REQUIRED_ENTRIES = {
+    'UNIT_MULTIPLIERS': ['Rai', 'm²'],  # capital bases are per Rai; default unit
+    'EXCHANGE_RATES_FALLBACK': ['THB'],  # base currency of the rates and capital; default currency
+    'ET_DATA': ['Bangkok'],  # default city
+    'USAGE_MULTIPLIERS': ['Manual', 'Auto'],  # default base and comparison methods
+    'KC_DATA': ['Reference'],  # default planting
+}
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _rate(value):
+    """A constant rate or a non-empty list of per-year rates, each above -100%."""
+    values = value if isinstance(value, list) else [value]
+    return bool(values) and all(_number(v) and v > -1 for v in values)
+
+
+def validate_tables(tables):
+    """Check a loaded table set before it is used; raises ValueError listing every problem."""
+    errors = []
+    missing = [name for name in TABLES if name not in tables]
+    if missing:
+        raise ValueError(f"Missing table(s): {', '.join(missing)}")
+    not_objects = [name for name in TABLES if name not in SCALAR_TABLES and not isinstance(tables[name], dict)]
+    if not_objects:
+        raise ValueError(f"Table(s) must be objects: {', '.join(not_objects)}")
+
+    def check(condition, message):
+        if not condition:
+            errors.append(message)
+
+    for name in ['ET_DATA', 'UNIT_MULTIPLIERS', 'EXCHANGE_RATES_FALLBACK', 'updated_city_coefficients_reviewed',
+                 'USAGE_MULTIPLIERS', 'GRID_EMISSION_FACTORS']:
+        check(isinstance(tables[name], dict) and tables[name], f"{name} must be a non-empty object")
+        if isinstance(tables[name], dict):
+            for key, value in tables[name].items():
+                check(_number(value) and value > 0, f"{name}[{key!r}] must be a positive number")
+    for name in ['CAPITAL_BASES', 'OPEX_SHARES', 'PUMPING_KWH_PER_M3', 'TRUCK_DIESEL_L_PER_M3']:
+        for key, value in tables[name].items():
+            check(_number(value) and value >= 0, f"{name}[{key!r}] must be a number >= 0")
+    for name in ['DEFAULT_GRID_FACTOR', 'DIESEL_KG_CO2_PER_L']:
+        check(_number(tables[name]) and tables[name] >= 0, f"{name} must be a number >= 0")
+    check(isinstance(tables['MAX_YEARS'], int) and tables['MAX_YEARS'] >= 2, "MAX_YEARS must be an integer >= 2")
+    for name, keys in REQUIRED_ENTRIES.items():
+        for key in keys:
+            check(key in tables[name], f"{name} must have {key!r}")
+    check(tables['EXCHANGE_RATES_FALLBACK'].get('THB') == 1, "EXCHANGE_RATES_FALLBACK['THB'] must be 1 (rates are per THB)")
+
+    # Every method table has to describe the same methods
+    methods = set(tables['USAGE_MULTIPLIERS'])
+    for name in METHOD_TABLES:
+        check(set(tables[name]) == methods, f"{name} must list exactly the methods {sorted(methods)}")
+    for method, components in tables['METHOD_COMPONENTS'].items():
+        check(method in methods, f"METHOD_COMPONENTS[{method!r}] is not a method")
+        for component in components if isinstance(components, list) else [None]:
+            check(isinstance(component, list) and len(component) == 3 and _number(component[1])
+                  and isinstance(component[2], int) and component[2] > 0,
+                  f"METHOD_COMPONENTS[{method!r}] entries must be [name, share, lifetime years]")
+
+    check(set(tables['OPEX_SHARES']) == {'labor', 'electricity', 'water'},
+          "OPEX_SHARES must have labor, electricity and water")
+    check(set(tables['ESCALATION_RATES']) == {'labor', 'electricity', 'water', 'et'},
+          "ESCALATION_RATES must have water, labor, electricity and et")
+    for name in ['ESCALATION_RATES', 'GRID_DECARBONIZATION']:
+        for key, value in tables[name].items():
+            check(_rate(value), f"{name}[{key!r}] must be a rate or a list of rates above -1")
+
+    for plant, kc in tables['KC_DATA'].items():
+        values = kc if isinstance(kc, list) else [kc]
+        check(len(values) in (1, 12) and all(_number(v) and v >= 0 for v in values),
+              f"KC_DATA[{plant!r}] must be a single value or 12 monthly values")
+
+    currencies = tables['EXCHANGE_RATES_FALLBACK']
+    for currency, decimals in tables['CURRENCY_DECIMALS'].items():
+        check(currency in currencies and isinstance(decimals, int) and not isinstance(decimals, bool)
+              and 0 <= decimals <= 4, f"CURRENCY_DECIMALS[{currency!r}] must map a known currency to 0..4 digits")
+    for name, tariff in tables['WATER_TARIFFS'].items():
+        if not isinstance(tariff, dict):
+            errors.append(f"WATER_TARIFFS[{name!r}] must be an object")
+            continue
+        check(tariff.get('currency') in currencies, f"WATER_TARIFFS[{name!r}] currency is not in EXCHANGE_RATES_FALLBACK")
+        check(tariff.get('period', 'monthly') in ('monthly', 'annual'), f"WATER_TARIFFS[{name!r}] period must be monthly or annual")
+        tiers = tariff.get('tiers') or []
+        if not isinstance(tiers, list) or not all(isinstance(tier, list) and len(tier) == 2 for tier in tiers):
+            errors.append(f"WATER_TARIFFS[{name!r}] tiers must be [upper bound, price] pairs")
+            continue
+        check(_number(tariff.get('fixed', 0.0)), f"WATER_TARIFFS[{name!r}] fixed charge must be a number")
+        bounds = [bound for bound, _ in tiers[:-1]]
+        check(tiers and tiers[-1][0] is None and all(_number(b) and b > 0 for b in bounds)
+              and bounds == sorted(set(bounds)) and all(_number(price) and price >= 0 for _, price in tiers),
+              f"WATER_TARIFFS[{name!r}] tiers must have increasing bounds and an open-ended last tier")
+
+    cities = tables['ET_DATA']
+    for city, tariff in tables['CITY_TARIFFS'].items():
+        check(city in cities and tariff in tables['WATER_TARIFFS'], f"CITY_TARIFFS[{city!r}] must map a city to a known tariff")
+    for city, region in tables['CITY_GRID_REGIONS'].items():
+        check(city in cities and region in tables['GRID_EMISSION_FACTORS'],
+              f"CITY_GRID_REGIONS[{city!r}] must map a city to a known grid region")
+
+    if errors:
+        raise ValueError("Invalid reference data:\n  " + "\n  ".join(errors))
+    return tables
+
+
+def load_tables(path=DATA_FILE):
+    """Read and validate the reference tables; raises ValueError (or OSError) when unusable."""
+    with open(path, encoding='utf-8') as f:
+        try:
+            raw = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"{path}: {e}") from None
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: expected an object of tables")
+    return validate_tables({name: value for name, value in raw.items() if not name.startswith('_')})
+
+
+def tables_version(tables):
+    """Short content hash of a table set, used to key caches built from it."""
+    payload = json.dumps(tables, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# ---------- CONSTANTS ----------
+# Tables as loaded at import, for scripts and notebooks. The app reads the
+# active snapshot from irrigation_app_model.current() so it sees reloads.
+globals().update(load_tables())
@@ -0,0 +1,161 @@
+import numpy as np
+
+import irrigation_app_model as model
+
+# ---------- GOAL SEEK ----------
+# Break-even inputs: the water price, area, horizon or city cost coefficient at
+# which the savings of a comparison method over a base method reach a target
+# (a payback period, annual savings or horizon savings), for many sites at once.
+# Each target becomes a residual that is zero at the answer (for payback,
+# capex_diff - target * annual_savings, which stays defined where payback is
+# not). Where the residual is affine in the unknown, two batch evaluations give
+# the answer in closed form: water price and area with a flat price, the city
+# coefficient always, and the horizon without escalation or replacements.
+# Block tariffs (area) are solved by vectorized bisection, and escalated or
+# lifecycle horizons by bisection over whole years.
+TARGETS = ('payback', 'annual_savings', 'total_savings')
+UNKNOWNS = ('water_price', 'area', 'years', 'coefficient')
+# Unknowns each target can depend on; solvable() narrows them to a scenario.
+# Not payback by area: capex and savings both scale with area at a flat price,
+# and a block tariff only moves payback within a narrow band
+SOLVABLE = {
+    'payback': ('water_price', 'coefficient'),
+    'annual_savings': ('water_price', 'area'),
+    'total_savings': ('water_price', 'area', 'years', 'coefficient'),
+}
+# Search range per unknown (area in m²); answers outside it are NaN
+BOUNDS = {'water_price': (0.0, 1e4), 'area': (1.0, 1e8), 'coefficient': (0.0, 100.0)}
+BISECTION_STEPS = 64
+TOLERANCE = 1e-9
+
+
+def _affine(residual, zeros, ones):
+    """Root of a residual affine in the unknown, from its values at 0 and 1 (NaN where it is flat)."""
+    r0, r1 = residual(zeros), residual(ones)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(r1 != r0, r0 / (r0 - r1), np.nan)
+
+
+def _bisect(residual, lo, hi):
+    """Roots in [lo, hi] by bisection, all sites in one batch per step; NaN where not bracketed."""
+    r_lo, r_hi = residual(lo), residual(hi)
+    bracketed = np.sign(r_lo) * np.sign(r_hi) <= 0
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        r_mid = residual(mid)
+        left = np.sign(r_mid) * np.sign(r_lo) <= 0
+        hi = np.where(left, mid, hi)
+        lo, r_lo = np.where(left, lo, mid), np.where(left, r_lo, r_mid)
+        if np.all(hi - lo <= TOLERANCE * np.maximum(1.0, np.abs(hi))):
+            break
+    return np.where(bracketed, (lo + hi) / 2, np.nan)
+
+
+def _whole_years(residual, sites, max_years, affine):
+    """Smallest horizon in 1..max_years at which the residual reaches zero, NaN where none does.
+
+    The residual is taken as monotonic in the horizon: it reaches zero from
+    below when it grows over the horizon, and from above when it shrinks.
+    """
+    first, last = residual(np.ones(sites, dtype=int)), residual(np.full(sites, max_years))
+    rising = last >= first
+
+    def reached(r):
+        return np.where(rising, r >= 0, r <= 0)
+
+    if affine:
+        root = _affine(residual, np.zeros(sites, dtype=int), np.ones(sites, dtype=int))
+        # Rounded first, so float noise in a root of exactly 3 does not make it 4
+        years = np.ceil(np.round(root, 9))
+    else:
+        lo, hi = np.ones(sites, dtype=int), np.full(sites, max_years)
+        while np.any(hi - lo > 1):
+            mid = (lo + hi) // 2
+            hit = reached(residual(mid))
+            hi, lo = np.where(hit, mid, hi), np.where(hit, lo, mid)
+        years = hi
+    years = np.where(reached(first), 1, years)
+    return np.where(reached(last), years, np.nan).astype(float)
+
+
+def solvable(target, tariff=None, lifecycle=False):
+    """Unknowns `target` depends on in a scenario: a block tariff does not use the
+    water price, and the city coefficient reaches horizon savings only through
+    lifecycle replacements."""
+    return tuple(u for u in SOLVABLE[target]
+                 if not (u == 'water_price' and tariff is not None)
+                 and not (target == 'total_savings' and u == 'coefficient' and not lifecycle))
+
+
+def goal_seek(unknown, target, value, area, unit, years, city, price, currency, base_method, comparison_method,
+              plant_idx=None, plant_fractions=None, escalation_rates=None, tariff=None, lifecycle=False, kc=None,
+              bounds=None, data=None):
+    """Value of `unknown` at which `target` of comparison_method over base_method equals `value`, per site.
+
+    unknown is one of UNKNOWNS and target one of TARGETS (payback in years,
+    savings unrounded in the site's currency); value may differ per site.
+    Sites are given as for model.site_inputs, scalars or (sites,) arrays; the
+    input named by `unknown` is ignored. Returns a float (sites,) array of
+    water prices per m³, areas in each site's unit, whole years or city cost
+    coefficients, NaN where no value within bounds (BOUNDS by default, years
+    1..MAX_YEARS) reaches the target. Payback answers also need positive
+    annual savings and capex difference, as in savings_summary. Raises
+    ValueError when the target does not depend on the unknown in this
+    scenario (see solvable).
+    """
+    if target not in TARGETS or unknown not in UNKNOWNS:
+        raise ValueError(f"Unknown target or input: {target!r}, {unknown!r}")
+    if unknown not in solvable(target, tariff, lifecycle):
+        raise ValueError(f"{target} does not depend on {unknown} in this scenario")
+    data = data or model.current()
+    method_index = {m: i for i, m in enumerate(data.METHODS)}
+    base_idx = model.index_of(base_method, method_index)
+    comp_idx = model.index_of(comparison_method, method_index)
+    sites = max(np.size(v) for v in (area, unit, years, city, price, currency, base_idx, comp_idx, value))
+
+    def per_site(v):
+        return np.broadcast_to(np.asarray(v), (sites,))
+
+    city, unit, value = per_site(city), per_site(unit), per_site(value).astype(float)
+    base_idx, comp_idx = per_site(base_idx), per_site(comp_idx)
+    inputs = model.site_inputs(per_site(area), unit, per_site(years).astype(int), city, per_site(price),
+                               per_site(currency), plant_idx, plant_fractions, escalation_rates, tariff, lifecycle,
+                               kc=kc, data=data)
+    grid_by_year = model.grid_cumulative(escalation_rates, data=data)[
+        data.CITY_REGION[model.index_of(city, data.CITY_INDEX)]]
+    name = {'water_price': 'price', 'area': 'm2', 'coefficient': 'city_coefficient'}.get(unknown, unknown)
+
+    def batch_inputs(x):
+        changed = dict(inputs, **{name: x})
+        if unknown == 'years':
+            # The grid's cumulative factor follows the horizon
+            changed['grid_cum'] = grid_by_year[np.arange(sites), x]
+        return changed
+
+    def summary(x):
+        return model.savings_summary(model.calculate_batch(**batch_inputs(x)), base_idx, comp_idx)
+
+    def residual(x):
+        s = summary(x)
+        if target == 'payback':
+            return s['capex_diff'] - value * s['annual_savings']
+        return s[target] - value
+
+    if unknown == 'years':
+        solved = _whole_years(residual, sites, data.MAX_YEARS, escalation_rates is None and not lifecycle)
+        at = np.where(np.isnan(solved), 1, solved).astype(int)
+    else:
+        low, high = bounds or BOUNDS[unknown]
+        if tariff is None or unknown == 'coefficient':
+            solved = _affine(residual, np.zeros(sites), np.ones(sites))
+        else:
+            solved = _bisect(residual, np.full(sites, float(low)), np.full(sites, float(high)))
+        solved = np.where((solved >= low) & (solved <= high), solved, np.nan)
+        at = np.where(np.isnan(solved), 0.0, solved)
+
+    if target == 'payback':
+        s = summary(at)
+        solved = np.where((s['annual_savings'] > 0) & (s['capex_diff'] > 0), solved, np.nan)
+    if unknown == 'area':
+        solved = solved / data.UNIT_M2[model.index_of(unit, data.UNIT_INDEX)]
+    return solved
@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+import irrigation_app_model as model
+from irrigation_app_sessions import deep_sizeof
+
+# ---------- COST MODEL GRAPH ----------
+# calculate_costs as a dependency graph of model stages. Each node remembers its
+# last value and the versions of its dependencies, so a new evaluation only runs
+# the nodes downstream of the inputs that changed: a new water price re-prices
+# the bill, opex and totals but keeps usage and capital, a new currency
+# rescales the base-currency capital (and re-prices a block tariff) only. A node whose new value
+# equals the old one keeps its version, which stops the change from spreading
+# (e.g. a planting mix with the same Kc).
+INPUTS = ('area', 'unit', 'years', 'city', 'price', 'currency', 'plant_mix', 'escalation', 'tariff', 'lifecycle',
+          'data')
+
+logger = logging.getLogger('irrigation_app.graph')
+
+
+def _m2(area, unit, data):
+    return area * data.UNIT_MULTIPLIERS[unit]
+
+
+def _usage_per_year(m2, city, kc, data):
+    return model.water_usage(m2, data.ET_DATA[city], kc, data)
+
+
+def _capital_base(m2, city, data):
+    return model.base_capital(m2, data.updated_city_coefficients_reviewed.get(city, 1.0), data)
+
+
+def _capital(capital_base, currency, data):
+    # Row of the cross-rate matrix from the base currency (THB)
+    return capital_base * data.EXCHANGE_RATES_FALLBACK[currency]
+
+
+def _factors(escalation, data):
+    # Escalation curves as ((name, annual rate), ...); None keeps prices and usage flat
+    return model.cumulative_factors(dict(escalation), data=data) if escalation else None
+
+
+def _grid_horizon(city, escalation, years, data):
+    # Cumulative grid factor of the city's region over the horizon
+    region = data.CITY_REGION[data.CITY_INDEX[city]]
+    return np.asarray(model.grid_cumulative(dict(escalation) if escalation else None, data=data)[region, years],
+                      dtype=float)[..., None]
+
+
+def _emissions(usage_per_year, city, data):
+    region = data.CITY_REGION[data.CITY_INDEX[city]]
+    return model.yearly_emissions(usage_per_year, data.GRID_FACTORS[region], data)
+
+
+def _per_method(values, data):
+    return dict(zip(data.METHODS, values.tolist()))
+
+
+def _rounded(values, data):
+    return {m: round(v, 2) for m, v in _per_method(values, data).items()}
+
+
+def _flat(factors, lifecycle):
+    return factors is None and not lifecycle
+
+
+def _usage(usage_per_year, usage_horizon, years, factors, lifecycle, data):
+    if _flat(factors, lifecycle):
+        # Total water usage across all methods for the given years
+        return {m: round(v * years, 2) for m, v in usage_per_year.items()}
+    return _rounded(usage_horizon[1], data)
+
+
+def _minor_units(currency, data):
+    return data.MINOR_UNITS[data.CURRENCY_INDEX[currency]]
+
+
+def _total_minor(capital, opex_per_year, replacement, opex, years, factors, lifecycle, minor_units):
+    # Capital plus operational expenses (and replacements) over the horizon, in minor units
+    return model.money_total(capital, opex_per_year, replacement, opex, years, minor_units, _flat(factors, lifecycle))
+
+
+def _money(counts, minor_units, data):
+    return _per_method(model.from_minor(counts, minor_units), data)
+
+
+def _co2(emissions, grid_horizon, usage_horizon):
+    pumping, diesel = emissions
+    return pumping * grid_horizon + diesel * usage_horizon[0]
+
+
+# (node, dependencies, function) in evaluation order; dependencies are inputs or earlier nodes
+NODES = (
+    ('m2', ('area', 'unit', 'data'), _m2),
+    ('kc', ('plant_mix', 'data'), model.plant_mix_kc),
+    ('usage_per_year', ('m2', 'city', 'kc', 'data'), _usage_per_year),
+    ('capital_base', ('m2', 'city', 'data'), _capital_base),
+    ('capital', ('capital_base', 'currency', 'data'), _capital),
+    ('factors', ('escalation', 'data'), _factors),
+    ('tariff_table', ('tariff', 'currency', 'data'), lambda tariff, currency, data:
+        model.tariff_for(tariff, currency, data) if tariff else None),
+    ('bill', ('usage_per_year', 'price', 'tariff_table'), model.yearly_bill),
+    ('opex_per_year', ('bill', 'data'), lambda bill, data: bill * data.OPEX_RATIO),
+    ('usage_horizon', ('usage_per_year', 'years', 'factors'), model.usage_horizon),
+    ('opex', ('bill', 'opex_per_year', 'years', 'factors'), model.opex_horizon),
+    ('replacement', ('capital', 'years', 'lifecycle', 'data'), model.replacement_cost),
+    ('emissions', ('usage_per_year', 'city', 'data'), _emissions),
+    ('grid_horizon', ('city', 'escalation', 'years', 'data'), _grid_horizon),
+    ('co2_per_year', ('emissions',), lambda emissions: emissions[0] + emissions[1]),
+    ('co2', ('emissions', 'grid_horizon', 'usage_horizon'), _co2),
+    # Money in int64 minor units of the currency, rounded as in money_batch
+    ('minor_units', ('currency', 'data'), _minor_units),
+    ('capital_minor', ('capital', 'minor_units'), model.to_minor),
+    ('opex_per_year_minor', ('opex_per_year', 'minor_units'), model.to_minor),
+    ('total_minor', ('capital_minor', 'opex_per_year_minor', 'replacement', 'opex', 'years', 'factors', 'lifecycle',
+                     'minor_units'), _total_minor),
+    # Results in the shape calculate_costs returns
+    ('usage_per_year_out', ('usage_per_year', 'data'), _per_method),
+    ('capital_out', ('capital_minor', 'minor_units', 'data'), _money),
+    ('opex_per_year_out', ('opex_per_year_minor', 'minor_units', 'data'), _money),
+    ('usage_out', ('usage_per_year_out', 'usage_horizon', 'years', 'factors', 'lifecycle', 'data'), _usage),
+    ('total_out', ('total_minor', 'minor_units', 'data'), _money),
+    ('co2_per_year_out', ('co2_per_year', 'data'), _per_method),
+    ('co2_out', ('co2', 'data'), _per_method),
+)
+OUTPUTS = ('usage_per_year_out', 'usage_out', 'total_out', 'capital_out', 'opex_per_year_out', 'co2_per_year_out',
+           'co2_out')
+
+
+def _same(a, b):
+    """Equal values, for the plain and numpy values the nodes produce."""
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return isinstance(a, np.ndarray) and isinstance(b, np.ndarray) and a.shape == b.shape \
+            and bool(np.array_equal(a, b))
+    if isinstance(a, tuple) and isinstance(b, tuple):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+class CostGraph:
+    """Memoized evaluation of the cost model for one user (one session).
+
+    evaluate() takes calculate_costs's arguments and returns the same seven
+    dicts; last_run lists the nodes that ran in the latest evaluation and
+    stats() counts runs and reuses per node. Evaluations are serialized per graph.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}  # node or input -> value
+        self._versions = {}  # node or input -> int, bumped when its value changes
+        self._seen = {}  # node -> dependency versions it was computed from
+        self.last_run = []
+        self.runs = {name: 0 for name, _, _ in NODES}
+        self.reuses = {name: 0 for name, _, _ in NODES}
+        self.last_seconds = 0.0
+
+    def _set(self, name, value):
+        if name in self._values and _same(self._values[name], value):
+            return
+        self._values[name] = value
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    def evaluate(self, area, unit, years, city, price, currency, plant_mix=None, escalation=None, tariff=None,
+                 lifecycle=False, data=None):
+        data = data or model.current()
+        with self._lock:
+            start = time.perf_counter()
+            for name, value in zip(INPUTS, (area, unit, years, city, price, currency, plant_mix, escalation, tariff,
+                                            lifecycle, data)):
+                self._set(name, value)
+            ran = []
+            for name, deps, fn in NODES:
+                versions = tuple(self._versions[d] for d in deps)
+                if self._seen.get(name) == versions:
+                    self.reuses[name] += 1
+                    continue
+                self._set(name, fn(*(self._values[d] for d in deps)))
+                self._seen[name] = versions
+                self.runs[name] += 1
+                ran.append(name)
+            self.last_run = ran
+            self.last_seconds = time.perf_counter() - start
+            logger.debug("cost graph ran %d of %d nodes: %s", len(ran), len(NODES), ', '.join(ran))
+            return tuple(self._values[name] for name in OUTPUTS)
+
+    def __sizeof__(self):
+        # The memoized node values are this graph's own; its inputs, such as the
+        # shared data snapshot, are not counted
+        with self._lock:
+            values = [self._values[name] for name, _, _ in NODES if name in self._values]
+        return object.__sizeof__(self) + deep_sizeof(values)
+
+    def stats(self):
+        """Nodes of the latest evaluation and run / reuse counts per node."""
+        return {
+            'last_run': list(self.last_run),
+            'last_ms': self.last_seconds * 1000,
+            'runs': dict(self.runs),
+            'reuses': dict(self.reuses),
+        }
@@ -0,0 +1,54 @@
+# Import-time budget for the Streamlit entry point.
+#
+#   python irrigation_app_import_budget.py [budget seconds]
+#
+# Imports irrigation_app in fresh interpreters (as a new server worker would),
+# fails when the best of a few runs exceeds the budget or when a module that
+# should load lazily was pulled in at import. Run it in CI after touching imports.
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IRRIGATION_IMPORT_BUDGET', 1.0))
+LAZY_MODULES = ['pandas', 'matplotlib', 'irrigation_app_portfolio']
+RUNS = 3
+
+_PROBE = '''
+import logging, sys, time
+logging.disable(logging.CRITICAL)  # bare-mode warnings from st.set_page_config
+start = time.perf_counter()
+import irrigation_app
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(m for m in {lazy!r} if m in sys.modules))
+'''
+
+
+def measure():
+    """(best import time in seconds, lazy modules that were imported anyway)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, loaded = [], set()
+    for _ in range(RUNS):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(lazy=LAZY_MODULES)], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.splitlines()
+        times.append(float(out[-2]))
+        loaded.update(m for m in out[-1].split(',') if m)
+    return min(times), sorted(loaded)
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_SECONDS
+    elapsed, loaded = measure()
+    print(f"import irrigation_app: {elapsed:.3f}s (budget {budget:.2f}s)")
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at startup but should load lazily: {', '.join(loaded)}")
+        failed = True
+    if elapsed > budget:
+        print("FAIL: over the import-time budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import heapq
+import itertools
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# ---------- JOB STORE ----------
+# Finished results are pickled here so any rerun (or a restarted server) can pick them up
+JOB_STORE_DIR = os.environ.get('IRRIGATION_JOB_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.job_store'))
+RESULT_RETENTION_SECONDS = 24 * 3600
+MAX_STORED_RESULTS = 200
+PRUNE_INTERVAL_SECONDS = 60  # at most one store scan per interval as jobs come and go
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by report_progress once cancellation was requested."""
+
+
+def _path(store_dir, job_id, suffix):
+    return os.path.join(store_dir, f"{job_id}{suffix}")
+
+
+def _atomic_write(path, payload):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+# ---------- INSIDE THE WORKER PROCESS ----------
+_current_job = None  # (store_dir, job_id) of the job running in this worker
+
+
+def report_progress(done, total):
+    """Called by long-running job functions to publish progress and honour cancellation."""
+    if _current_job is None:
+        return
+    store_dir, job_id = _current_job
+    if os.path.exists(_path(store_dir, job_id, '.cancel')):
+        raise JobCancelled(job_id)
+    _atomic_write(_path(store_dir, job_id, '.progress'), json.dumps({'done': done, 'total': total}).encode())
+
+
+def _execute(store_dir, job_id, fn, args, kwargs):
+    global _current_job
+    _current_job = (store_dir, job_id)
+    try:
+        result = fn(*args, **kwargs)
+        _atomic_write(_path(store_dir, job_id, '.pkl'), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    finally:
+        _current_job = None
+
+
+# ---------- SCHEDULER ----------
+class JobScheduler:
+    """Local job scheduler on a process pool.
+
+    Jobs get an ID (or use the caller's `key`, so identical requests share one
+    job and its stored result), a priority (lower runs first), cooperative
+    cancellation through report_progress, and results kept in JOB_STORE_DIR
+    for RESULT_RETENTION_SECONDS (pruned as jobs are submitted and finish).
+    Callers poll status() instead of blocking.
+    """
+
+    def __init__(self, store_dir=JOB_STORE_DIR, max_workers=None):
+        self.store_dir = store_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        os.makedirs(store_dir, exist_ok=True)
+        self._pool = None
+        self._lock = threading.RLock()  # done-callbacks may fire inside _dispatch
+        self._queue = []
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._running = 0
+        self.prune()
+        self._last_prune = time.time()
+
+    def submit(self, fn, *args, priority=10, key=None, **kwargs):
+        """Queue fn(*args, **kwargs) and return its job ID; fn must be picklable."""
+        self._maybe_prune()
+        job_id = key or uuid.uuid4().hex
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['status'] in (QUEUED, RUNNING):
+                return job_id
+            if os.path.exists(_path(self.store_dir, job_id, '.pkl')):
+                self._jobs[job_id] = {'status': DONE, 'priority': priority, 'submitted': time.time(), 'error': None}
+                return job_id
+            for suffix in ('.cancel', '.progress'):
+                if os.path.exists(_path(self.store_dir, job_id, suffix)):
+                    os.remove(_path(self.store_dir, job_id, suffix))
+            self._jobs[job_id] = {'status': QUEUED, 'priority': priority, 'submitted': time.time(), 'error': None,
+                                  'call': (fn, args, kwargs)}
+            heapq.heappush(self._queue, (priority, next(self._seq), job_id))
+            self._dispatch()
+        return job_id
+
+    def _dispatch(self):
+        # Caller holds the lock
+        while self._running < self.max_workers and self._queue:
+            _, _, job_id = heapq.heappop(self._queue)
+            job = self._jobs[job_id]
+            if job['status'] != QUEUED:
+                continue  # cancelled while queued
+            fn, args, kwargs = job.pop('call')
+            job['status'] = RUNNING
+            job['started'] = time.time()
+            self._running += 1
+            try:
+                future = self._get_pool().submit(_execute, self.store_dir, job_id, fn, args, kwargs)
+            except BrokenProcessPool:
+                self._pool = None
+                future = self._get_pool().submit(_execute, self.store_dir, job_id, fn, args, kwargs)
+            future.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, f))
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _finished(self, job_id, future):
+        with self._lock:
+            job = self._jobs[job_id]
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                job['status'] = CANCELLED
+            elif error is not None:
+                if isinstance(error, BrokenProcessPool):
+                    self._pool = None  # a worker died; start a fresh pool for the next job
+                job['status'] = FAILED
+                job['error'] = f"{type(error).__name__}: {error}"
+            else:
+                job['status'] = DONE
+            job['finished'] = time.time()
+            self._running -= 1
+            self._dispatch()
+        self._maybe_prune()
+
+    def status(self, job_id):
+        """{'status', 'progress' (0..1 or None), 'error'} for a job; stored results count as done."""
+        with self._lock:
+            job = dict(self._jobs.get(job_id) or {})
+        if not job:
+            stored = os.path.exists(_path(self.store_dir, job_id, '.pkl'))
+            return {'status': DONE if stored else None, 'progress': 1.0 if stored else None, 'error': None}
+
+        progress = 1.0 if job['status'] == DONE else None
+        if job['status'] == RUNNING:
+            try:
+                with open(_path(self.store_dir, job_id, '.progress')) as f:
+                    p = json.load(f)
+                progress = p['done'] / p['total'] if p['total'] else 0.0
+            except (OSError, ValueError):
+                progress = 0.0
+        return {'status': job['status'], 'progress': progress, 'error': job['error']}
+
+    def result(self, job_id):
+        """Stored result of a finished job, or None."""
+        try:
+            with open(_path(self.store_dir, job_id, '.pkl'), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def cancel(self, job_id):
+        """Drop a queued job, or ask a running one to stop at its next report_progress."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if job['status'] == QUEUED:
+                job['status'] = CANCELLED
+                job.pop('call', None)
+            elif job['status'] == RUNNING:
+                _atomic_write(_path(self.store_dir, job_id, '.cancel'), b'')
+
+    def _maybe_prune(self):
+        with self._lock:
+            if time.time() - self._last_prune < PRUNE_INTERVAL_SECONDS:
+                return
+            self._last_prune = time.time()
+        self.prune()
+
+    def prune(self, retention_seconds=RESULT_RETENTION_SECONDS, max_results=MAX_STORED_RESULTS):
+        """Delete expired results, and the oldest ones beyond max_results.
+
+        Finished jobs whose result is gone, or that ended longer ago than
+        retention_seconds, are forgotten too.
+        """
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if name.endswith('.pkl'):
+                entries.append((mtime, path))
+            elif now - mtime > retention_seconds:
+                entries.append((0, path))  # stale progress/cancel/tmp files
+        entries.sort(reverse=True)
+        for i, (mtime, path) in enumerate(entries):
+            if i >= max_results or now - mtime > retention_seconds:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # already removed by another process
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job['status'] in (QUEUED, RUNNING):
+                    continue
+                if now - job.get('finished', job['submitted']) > retention_seconds \
+                        or (job['status'] == DONE and not os.path.exists(_path(self.store_dir, job_id, '.pkl'))):
+                    del self._jobs[job_id]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by all sessions."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -0,0 +1,186 @@
+# Load harness: many simulated sessions against one in-process app.
+#
+#   python irrigation_app_loadtest.py [--sessions 20] [--steps 10] [--think 10] [--json report.json]
+#
+# Each session is a headless AppTest of irrigation_app.py with its own session
+# state: it switches language now and then, changes inputs and clicks
+# Calculate. AppTest reruns cannot overlap in one process (they share the
+# runtime singleton), so sessions are interleaved in random order; all of them
+# stay alive, as open tabs do on a server. Rerun latency is therefore service
+# time without queueing, and capacity is derived from CPU per rerun, which is
+# what bounds a server whose reruns serialize on the GIL anyway. CPU includes
+# AppTest's own element-tree work, so the capacity figure is a lower bound.
+# Process RSS and CPU are sampled around the run. No external services.
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'irrigation_app.py')
+
+
+def rss_bytes():
+    """Current resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, q):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def session_reruns(session, steps, seed):
+    """One simulated user; yields (action, seconds) after every rerun.
+
+    Widgets are found by their key= in the calculator page (see main()), so
+    reordering the page does not change which input a step sets.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_SCRIPT, default_timeout=120)
+
+    def timed(action, element=None):
+        start = time.perf_counter()
+        (element.run() if element is not None else at.run())
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"session {session}: {action} failed: {at.exception[0].value}")
+        return action, elapsed
+
+    yield timed('load')
+    for _ in range(steps):
+        if rng.random() < 0.2:
+            language = at.selectbox(key='language')
+            yield timed('language', language.set_value(rng.choice([o for o in language.options if o != language.value])))
+        change = rng.choice(['city', 'unit', 'currency', 'area', 'water_price', 'years'])
+        if change in ('city', 'unit', 'currency'):
+            box = at.selectbox(key=change)
+            yield timed('input', box.set_value(rng.choice(box.options)))
+        elif change == 'area':
+            yield timed('input', at.number_input(key='area').set_value(float(rng.randint(100, 50000))))
+        elif change == 'water_price':
+            yield timed('input', at.number_input(key='water_price').set_value(round(rng.uniform(2, 40), 1)))
+        else:
+            yield timed('input', at.slider(key='years').set_value(rng.randint(1, 20)))
+        yield timed('calculate', at.button(key='calculate').click())
+
+
+def load_test(sessions=20, steps=10, think_seconds=10.0, seed=0):
+    """Run the simulated sessions interleaved and return the capacity report as a dict."""
+    logging.disable(logging.WARNING)
+    # Import Streamlit and the app and fill the process-wide caches first, so
+    # the RSS baseline and the per-session figure only cover session growth
+    for _ in session_reruns('warm-up', 1, seed):
+        pass
+    rss_start = rss_bytes()
+    peak = [rss_start]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.2):
+            peak[0] = max(peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    cpu_start, wall_start = os.times(), time.perf_counter()
+    rng = random.Random(seed)
+    active = [session_reruns(i, steps, seed + i) for i in range(sessions)]
+    timings = []
+    while active:
+        user = rng.choice(active)
+        try:
+            timings.append(next(user))
+        except StopIteration:
+            active.remove(user)
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    stop.set()
+    sampler.join()
+    rss_end = rss_bytes()
+
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    reruns = len(timings)
+    by_action = {}
+    for action, seconds in timings:
+        by_action.setdefault(action, []).append(seconds)
+
+    def stats(values):
+        return {'count': len(values), 'p50_ms': percentile(values, 50) * 1000, 'p90_ms': percentile(values, 90) * 1000,
+                'p99_ms': percentile(values, 99) * 1000, 'max_ms': max(values) * 1000}
+
+    cpu_per_rerun = cpu / reruns
+    return {
+        'sessions': sessions,
+        'steps_per_session': steps,
+        'reruns': reruns,
+        'wall_s': wall,
+        'throughput_rps': reruns / wall,
+        'latency': stats([s for _, s in timings]),
+        'latency_by_action': {action: stats(values) for action, values in by_action.items()},
+        'cpu_s': cpu,
+        'cpu_ms_per_rerun': cpu_per_rerun * 1000,
+        'cpu_utilization': cpu / wall,
+        'rss_start_mb': rss_start / 2**20,
+        'rss_peak_mb': peak[0] / 2**20,
+        'rss_end_mb': rss_end / 2**20,
+        'rss_per_session_mb': max(rss_end - rss_start, 0) / sessions / 2**20,
+        # One core serves 1 / cpu_per_rerun reruns per second; a user triggers one rerun every think_seconds
+        'think_seconds': think_seconds,
+        'estimated_users_per_core': think_seconds / cpu_per_rerun,
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Sessions: {report['sessions']} x {report['steps_per_session']} steps, "
+        f"{report['reruns']} reruns in {report['wall_s']:.1f}s ({report['throughput_rps']:.1f} reruns/s)",
+        '',
+        f"{'rerun':<12}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for action, s in [('all', report['latency'])] + sorted(report['latency_by_action'].items()):
+        lines.append(f"{action:<12}{s['count']:>7}{s['p50_ms']:>10.1f}{s['p90_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+    lines += [
+        '',
+        f"CPU: {report['cpu_s']:.1f}s total, {report['cpu_ms_per_rerun']:.1f} ms per rerun, "
+        f"{report['cpu_utilization']:.2f} cores busy on average",
+        f"RSS: {report['rss_start_mb']:.0f} MB at start, {report['rss_peak_mb']:.0f} MB peak, "
+        f"{report['rss_end_mb']:.0f} MB at end (~{report['rss_per_session_mb']:.2f} MB per session)",
+        f"Capacity: ~{report['estimated_users_per_core']:.0f} active users per core "
+        f"at one rerun every {report['think_seconds']:.0f}s per user",
+    ]
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate concurrent sessions and report capacity.')
+    parser.add_argument('--sessions', type=int, default=20, help='concurrent simulated sessions')
+    parser.add_argument('--steps', type=int, default=10, help='input change + Calculate cycles per session')
+    parser.add_argument('--think', type=float, default=10.0, help='seconds between a real user\'s reruns')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    report = load_test(args.sessions, args.steps, args.think, args.seed)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
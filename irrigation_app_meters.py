@@ -0,0 +1,251 @@
+# Smart-meter readings against the model, and usage multipliers fitted to them.
+#
+#   python irrigation_app_meters.py readings.csv [more.csv ...] --sites sites.csv [--output calibration.json]
+#
+# Readings are CSV rows of site, timestamp and volume (m³ used since the
+# previous reading). Files of any size are streamed in blocks by pyarrow's
+# multi-threaded CSV reader (installed with Streamlit) and summed per site and
+# calendar month as the blocks arrive, so memory depends on sites x months,
+# not on the number of readings. The site list is in the portfolio format
+# (site, area, city, unit, base_method, plant_type), base_method being the
+# method the site irrigates with.
+#
+# Each site is compared with the model over the whole months between its
+# first and last reading (partial first and last months are left out), with
+# the model's yearly usage spread over the months by the planting's Kc
+# profile. Per city and method, the ratio of summed observed to modeled
+# volumes scales USAGE_MULTIPLIERS into a calibrated multiplier.
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import irrigation_app_model as model
+
+READING_COLUMNS = ('site', 'timestamp', 'volume_m3')
+# The reader keeps a few dozen blocks in flight, so this bounds its memory (~40 MB at 1 MB)
+BLOCK_BYTES = 1 << 20
+
+logger = logging.getLogger('irrigation_app.meters')
+
+
+class MeterTotals:
+    """Volumes and reading counts per site and calendar month, grown as readings arrive.
+
+    Months are keys year * 12 + month - 1; volume[i, k] belongs to site
+    self.sites[i] and month first_month + k.
+    """
+
+    def __init__(self):
+        self.sites = []
+        self.site_index = {}
+        self.first_month = None
+        self.volume = np.zeros((0, 0))
+        self.readings = np.zeros((0, 0), dtype=np.int64)
+
+    def site_codes(self, names):
+        """Positions of site names, adding new sites."""
+        codes = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            code = self.site_index.get(name)
+            if code is None:
+                code = self.site_index[name] = len(self.sites)
+                self.sites.append(name)
+            codes[i] = code
+        return codes
+
+    def _grow(self, low, high):
+        # Room for every known site and for months low..high
+        first = low if self.first_month is None else min(low, self.first_month)
+        last = high if self.first_month is None else max(high, self.first_month + self.volume.shape[1] - 1)
+        before = 0 if self.first_month is None else self.first_month - first
+        shape = (len(self.sites), last - first + 1)
+        if shape != self.volume.shape:
+            pad = ((0, shape[0] - self.volume.shape[0]), (before, shape[1] - self.volume.shape[1] - before))
+            self.volume = np.pad(self.volume, pad)
+            self.readings = np.pad(self.readings, pad)
+        self.first_month = first
+
+    def add(self, site, month, volume):
+        """Add readings given as site positions, month keys and volumes (arrays of one length)."""
+        if not len(site):
+            return
+        low, high = int(month.min()), int(month.max())
+        self._grow(low, high)
+        span = high - low + 1
+        # One bincount over (site, month) cells of this block
+        cells = site * span + (month - low)
+        size = len(self.sites) * span
+        offset = low - self.first_month
+        self.volume[:, offset:offset + span] += np.bincount(cells, weights=volume, minlength=size).reshape(-1, span)
+        self.readings[:, offset:offset + span] += np.bincount(cells, minlength=size).reshape(-1, span)
+
+    def merge(self, other):
+        """Add the totals of another MeterTotals (e.g. from a worker process)."""
+        if other.first_month is None:
+            return
+        codes = self.site_codes(other.sites)
+        months = other.months()
+        self._grow(int(months[0]), int(months[-1]))
+        offset = int(months[0]) - self.first_month
+        columns = slice(offset, offset + len(months))
+        np.add.at(self.volume[:, columns], codes, other.volume)
+        np.add.at(self.readings[:, columns], codes, other.readings)
+
+    def months(self):
+        """Month keys of the columns."""
+        return np.arange(self.volume.shape[1]) + (self.first_month or 0)
+
+
+def read_meter_csv(path, totals, columns=READING_COLUMNS, volume_scale=1.0, block_bytes=BLOCK_BYTES):
+    """Stream one readings file into totals; returns the number of readings used.
+
+    columns names the site, timestamp and volume columns; volume_scale
+    converts the volumes to m³ (0.001 for litres). Rows with a missing value
+    are skipped.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    site_col, time_col, volume_col = columns
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_bytes),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(columns),
+            column_types={site_col: pa.dictionary(pa.int32(), pa.string()), time_col: pa.timestamp('s'),
+                          volume_col: pa.float64()}
+        )
+    )
+    used = 0
+    for batch in reader:
+        sites, stamps, volumes = (batch.column(name) for name in columns)
+        valid = pc.and_(pc.and_(pc.is_valid(sites), pc.is_valid(stamps)), pc.is_valid(volumes))
+        if valid.false_count:
+            sites, stamps, volumes = (pc.filter(a, valid) for a in (sites, stamps, volumes))
+        # Codes of this block's dictionary, then one gather per reading
+        codes = totals.site_codes(sites.dictionary.to_pylist())
+        month = pc.add(pc.multiply(pc.year(stamps), 12), pc.subtract(pc.month(stamps), 1))
+        totals.add(codes[sites.indices.to_numpy(zero_copy_only=False)], month.to_numpy(zero_copy_only=False),
+                   volumes.to_numpy(zero_copy_only=False) * volume_scale)
+        used += len(volumes)
+    return used
+
+
+def observed_months(totals):
+    """(sites, months) mask of the whole months between each site's first and last reading."""
+    seen = totals.readings > 0
+    if not seen.size:
+        return seen
+    columns = np.arange(seen.shape[1])
+    first = np.where(seen.any(axis=1), seen.argmax(axis=1), seen.shape[1])
+    last = seen.shape[1] - 1 - seen[:, ::-1].argmax(axis=1)
+    return (columns > first[:, None]) & (columns < last[:, None])
+
+
+def compare_sites(totals, sites, data=None, keys=None):
+    """Observed against modeled volumes per metered site of the site list.
+
+    sites is a read_portfolio() frame; keys are the totals' names for its
+    rows (the site column by default). Sites without readings, or with fewer
+    than three months of them, are left out. Returns one row per site.
+    """
+    data = data or model.current()
+    row_of = totals.site_index
+    keys = sites['site'].astype(str).tolist() if keys is None else list(keys)
+    metered = np.array([key in row_of for key in keys], dtype=bool)
+    sites = sites[metered].reset_index(drop=True)
+    rows = np.array([row_of[key] for key, m in zip(keys, metered) if m], dtype=np.intp)
+    plant_idx = model.index_of(sites['plant_type'], data.PLANT_INDEX) if 'plant_type' in sites.columns else None
+    usage = model.calculate_sites(sites['area'].to_numpy(float), sites['unit'], 1, sites['city'], 0.0,
+                                  data.CURRENCIES[0], plant_idx=plant_idx, data=data)['usage_per_year']
+    method_idx = model.index_of(sites['base_method'], {m: i for i, m in enumerate(data.METHODS)})
+    per_year = usage[np.arange(len(sites)), method_idx]
+
+    # Share of the year in each calendar month: flat ET, so Kc sets the profile
+    if plant_idx is None:
+        shares = np.full((len(sites), 12), 1 / 12)
+    else:
+        shares = data.KC_MONTHLY[plant_idx] / data.KC_MONTHLY[plant_idx].sum(axis=1, keepdims=True)
+    used = observed_months(totals)[rows]
+    calendar = totals.months() % 12
+    modeled = (shares[:, calendar] * used).sum(axis=1) * per_year
+    observed = (totals.volume[rows] * used).sum(axis=1)
+    months = used.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = observed / modeled
+    return pd.DataFrame({
+        'site': sites['site'].astype(str),
+        'city': sites['city'],
+        'method': sites['base_method'],
+        'months': months,
+        'observed_m3': observed,
+        'modeled_m3': modeled,
+        'ratio': ratio,
+        'modeled_per_year_m3': per_year,
+    })[months > 0].reset_index(drop=True)
+
+
+def calibrate(comparison, data=None):
+    """Calibrated usage multipliers per city and method, {city: {method: multiplier}}.
+
+    Each is USAGE_MULTIPLIERS[method] times the observed/modeled ratio of the
+    summed volumes of that city's sites using the method (the least-squares
+    ratio when errors grow with site size).
+    """
+    data = data or model.current()
+    sums = comparison.groupby(['city', 'method'])[['observed_m3', 'modeled_m3']].sum()
+    calibrated = {}
+    for (city, method), row in sums.iterrows():
+        if row['modeled_m3'] > 0:
+            calibrated.setdefault(city, {})[method] = round(
+                data.USAGE_MULTIPLIERS[method] * row['observed_m3'] / row['modeled_m3'], 4)
+    return calibrated
+
+
+def main():
+    from irrigation_app_portfolio import read_portfolio
+
+    parser = argparse.ArgumentParser(description='Compare smart-meter readings with the model and fit usage multipliers.')
+    parser.add_argument('readings', nargs='+', help='readings CSV files')
+    parser.add_argument('--sites', required=True, help='site list (CSV / XLSX, as on the portfolio page)')
+    parser.add_argument('--columns', nargs=3, default=list(READING_COLUMNS), metavar=('SITE', 'TIMESTAMP', 'VOLUME'),
+                        help='column names in the readings files')
+    parser.add_argument('--volume-scale', type=float, default=1.0, help='factor to m³ (0.001 for litres)')
+    parser.add_argument('--output', help='write the calibrated multipliers to this JSON file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    totals = MeterTotals()
+    for path in args.readings:
+        start = time.perf_counter()
+        used = read_meter_csv(path, totals, tuple(args.columns), args.volume_scale)
+        seconds = time.perf_counter() - start
+        logger.info("%s: %d readings in %.1fs (%.0f MB/s)", path, used, seconds,
+                    os.path.getsize(path) / 2**20 / max(seconds, 1e-9))
+
+    with open(args.sites, 'rb') as f:
+        sites = read_portfolio(f.read(), args.sites)
+    data = model.current()
+    comparison = compare_sites(totals, sites, data)
+    calibrated = calibrate(comparison, data)
+    print(f"{len(comparison)} of {len(totals.sites)} metered sites compared")
+    print(f"{'city':<20}{'method':<10}{'sites':>7}{'observed/model':>16}{'multiplier':>12}{'model':>8}")
+    for (city, method), group in comparison.groupby(['city', 'method']):
+        ratio = group['observed_m3'].sum() / group['modeled_m3'].sum()
+        print(f"{city:<20}{method:<10}{len(group):>7}{ratio:>16.3f}{calibrated.get(city, {}).get(method, np.nan):>12.3f}"
+              f"{data.USAGE_MULTIPLIERS[method]:>8.2f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(calibrated, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
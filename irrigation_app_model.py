@@ -0,0 +1,593 @@
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+import irrigation_app_data
+
+logger = logging.getLogger(__name__)
+
+
+def _monthly_kc(value):
+    """Expand one KC_DATA entry to 12 monthly values."""
+    kc = np.asarray(value, dtype=float)
+    if kc.ndim == 0:
+        return np.full(12, float(kc))
+    if kc.shape != (12,):
+        raise ValueError("Kc must be a single value or 12 monthly values")
+    return kc
+
+
+# ---------- LOOKUP ARRAYS ----------
+class ModelData:
+    """One version of the reference tables plus every lookup array derived from them.
+
+    A snapshot is built completely before it is installed and never changes
+    afterwards, so a calculation that holds one sees consistent data even if
+    the tables are reloaded meanwhile. The raw tables are attributes too
+    (data.ET_DATA, data.MAX_YEARS, ...).
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.version = irrigation_app_data.tables_version(tables)
+        for name, value in tables.items():
+            setattr(self, name, value)
+
+        # Every table is turned into a flat array once so per-site lookups are gathers
+        self.METHODS = list(self.USAGE_MULTIPLIERS.keys())
+        self.CITIES = list(self.ET_DATA.keys())
+        self.CURRENCIES = list(self.EXCHANGE_RATES_FALLBACK.keys())
+        self.UNITS = list(self.UNIT_MULTIPLIERS.keys())
+        self.PLANT_TYPES = list(self.KC_DATA.keys())
+
+        self.CITY_INDEX = {c: i for i, c in enumerate(self.CITIES)}
+        self.CURRENCY_INDEX = {c: i for i, c in enumerate(self.CURRENCIES)}
+        self.UNIT_INDEX = {u: i for i, u in enumerate(self.UNITS)}
+        self.PLANT_INDEX = {p: i for i, p in enumerate(self.PLANT_TYPES)}
+
+        self.ET_MM = np.array([self.ET_DATA[c] for c in self.CITIES], dtype=float)
+        self.CITY_COEFFICIENTS = np.array([self.updated_city_coefficients_reviewed.get(c, 1.0) for c in self.CITIES],
+                                          dtype=float)
+        self.RATES = np.array([self.EXCHANGE_RATES_FALLBACK[c] for c in self.CURRENCIES], dtype=float)
+        # CROSS_RATES[i, j] = units of currency j per unit of currency i (rates are quoted per THB)
+        self.CROSS_RATES = self.RATES[None, :] / self.RATES[:, None]
+        # Minor units per currency unit (100 for cents, 1 where there are none)
+        self.MINOR_UNITS = np.array([10 ** self.CURRENCY_DECIMALS.get(c, 2) for c in self.CURRENCIES], dtype=np.int64)
+        self.UNIT_M2 = np.array([self.UNIT_MULTIPLIERS[u] for u in self.UNITS], dtype=float)
+
+        self.USAGE_FACTORS = np.array([self.USAGE_MULTIPLIERS[m] for m in self.METHODS], dtype=float)
+        self.BASE_CAPITAL = np.array([self.CAPITAL_BASES[m] for m in self.METHODS], dtype=float)
+        self.OPEX_RATIO = sum(self.OPEX_SHARES.values())
+
+        self.GRID_REGIONS = list(self.GRID_EMISSION_FACTORS.keys())
+        self.REGION_INDEX = {r: i for i, r in enumerate(self.GRID_REGIONS)}
+        # Last slot is the fallback region for cities without a grid mapping
+        self.GRID_FACTORS = np.array([self.GRID_EMISSION_FACTORS[r] for r in self.GRID_REGIONS]
+                                     + [self.DEFAULT_GRID_FACTOR], dtype=float)
+        self.CITY_REGION = np.array([self.REGION_INDEX.get(self.CITY_GRID_REGIONS.get(c), len(self.GRID_REGIONS))
+                                     for c in self.CITIES], dtype=np.intp)
+        self.PUMPING_KWH = np.array([self.PUMPING_KWH_PER_M3[m] for m in self.METHODS], dtype=float)
+        self.DIESEL_KG_PER_M3 = (np.array([self.TRUCK_DIESEL_L_PER_M3[m] for m in self.METHODS], dtype=float)
+                                 * self.DIESEL_KG_CO2_PER_L)
+
+        self.KC_MONTHLY = np.stack([_monthly_kc(self.KC_DATA[p]) for p in self.PLANT_TYPES])  # (plants, 12)
+        self.KC_ANNUAL = self.KC_MONTHLY.mean(axis=1)  # (plants,) for a flat monthly ET profile
+
+        self.TARIFFS = list(self.WATER_TARIFFS.keys())
+        self.TARIFF_INDEX = {t: i for i, t in enumerate(self.TARIFFS)}
+
+        self.REPLACEMENT_EVENTS = _replacement_events(self)
+        # REPLACEMENT_CUM[:, years] = replacement share bought within a horizon of `years`
+        self.REPLACEMENT_CUM = np.concatenate([np.zeros((len(self.METHODS), 1)),
+                                               np.cumsum(self.REPLACEMENT_EVENTS, axis=1)[:, :-1]], axis=1)
+        # (max_years + 1, methods) for per-site gathers
+        self.REPLACEMENT_BY_YEARS = np.ascontiguousarray(self.REPLACEMENT_CUM.T)
+
+
+def _replacement_events(data):
+    """Replacement capex per method and year as a share of initial capital, (methods, MAX_YEARS + 1).
+
+    A component with lifetime L is replaced at the end of years L, 2L, ... when
+    the horizon continues past them; column t holds the events at the end of year t.
+    """
+    events = np.zeros((len(data.METHODS), data.MAX_YEARS + 1))
+    for i, method in enumerate(data.METHODS):
+        for _, share, life in data.METHOD_COMPONENTS.get(method, []):
+            events[i, life:data.MAX_YEARS:life] += share
+    return events
+
+
+# ---------- HOT RELOAD ----------
+# The active snapshot. Installing a new one is a single reference assignment,
+# so readers never see a half-built table set.
+_current = ModelData(irrigation_app_data.load_tables())
+_watcher = None
+_watcher_lock = threading.Lock()
+RELOAD_INTERVAL = float(os.environ.get('IRRIGATION_DATA_RELOAD_INTERVAL', 2.0))
+
+
+def current():
+    """The active data snapshot. Take it once per request and pass it along as `data`."""
+    return _current
+
+
+def install(tables):
+    """Build a snapshot from validated tables and make it the active one."""
+    global _current
+    data = ModelData(tables)
+    _current = data
+    return data
+
+
+def reload(path=None):
+    """Load, validate and install the data file. Raises ValueError and keeps the old data when invalid."""
+    tables = irrigation_app_data.load_tables(path or irrigation_app_data.DATA_FILE)
+    if irrigation_app_data.tables_version(tables) == _current.version:
+        return _current
+    data = install(tables)
+    logger.info("Reference data reloaded (version %s)", data.version)
+    return data
+
+
+def _watch(path, interval):
+    last = None
+    while True:
+        try:
+            stamp = os.stat(path).st_mtime_ns
+        except OSError:
+            stamp = None  # mid-save or removed; keep the current data
+        if stamp is not None and last is not None and stamp != last:
+            try:
+                reload(path)
+            except Exception:
+                logger.exception("Ignoring invalid reference data in %s; keeping version %s", path, _current.version)
+        last = stamp if stamp is not None else last
+        time.sleep(interval)
+
+
+def start_data_watcher(path=None, interval=RELOAD_INTERVAL):
+    """Poll the data file's mtime in a daemon thread and hot-swap valid edits. Safe to call repeatedly."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = threading.Thread(target=_watch, args=(path or irrigation_app_data.DATA_FILE, interval),
+                                        name='irrigation-data-watcher', daemon=True)
+            _watcher.start()
+        return _watcher
+
+
+def __getattr__(name):
+    # model.CITIES, model.RATES, ... read from the active snapshot
+    try:
+        return getattr(_current, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def index_of(values, index):
+    """Map an array of names (cities, currencies, ...) to positions in a lookup table.
+
+    Only the distinct names go through the dict, so this stays cheap for large batches.
+    """
+    uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    try:
+        positions = np.array([index[u] for u in uniques], dtype=np.intp)
+    except KeyError as e:
+        raise KeyError(f"Unknown value {e.args[0]!r}") from None
+    return positions[inverse.reshape(-1)]
+
+
+def landscape_kc(plant_idx, fractions=None, month_weights=None, data=None):
+    """Area-weighted Kc per site.
+
+    plant_idx is an int array of plant types, either (sites,) for one type per site or
+    (sites, k) for mixed plantings with matching area `fractions`. month_weights is an
+    optional share of annual ET per month, (12,) or (sites, 12); without it monthly Kc
+    values are averaged evenly.
+    """
+    data = data or _current
+    idx = np.asarray(plant_idx, dtype=np.intp)
+    if idx.ndim == 1:
+        idx = idx[:, None]
+    frac = np.ones(idx.shape) if fractions is None else np.asarray(fractions, dtype=float).reshape(idx.shape)
+
+    if month_weights is None:
+        return (data.KC_ANNUAL[idx] * frac).sum(axis=1)
+
+    weights = np.asarray(month_weights, dtype=float)
+    kc_month = (data.KC_MONTHLY[idx] * frac[..., None]).sum(axis=1)  # (sites, 12)
+    return (kc_month * weights).sum(axis=-1)
+
+
+def plant_mix_kc(plant_mix, data=None):
+    """Kc for a single site given as ((plant type, area fraction), ...)."""
+    data = data or _current
+    if not plant_mix:
+        return 1.0
+    names, fractions = zip(*plant_mix)
+    fractions = np.asarray(fractions, dtype=float)
+    fractions = fractions / fractions.sum()
+    idx = np.array([[data.PLANT_INDEX[n] for n in names]])
+    return float(landscape_kc(idx, fractions[None, :], data=data)[0])
+
+
+# ---------- ESCALATION ----------
+def escalation_curve(rate, max_years):
+    """Price/usage index for years 1..max_years (year 1 = 1.0).
+
+    rate is a constant annual rate or a list of per-year rates; a short list
+    keeps its last rate for the remaining years.
+    """
+    rates = np.atleast_1d(np.asarray(rate, dtype=float))
+    steps = np.full(max_years - 1, rates[-1] if rates.size else 0.0)
+    n = min(rates.size, max_years - 1)
+    steps[:n] = rates[:n]
+    return np.concatenate([[1.0], np.cumprod(1 + steps)])
+
+
+@lru_cache(maxsize=32)
+def _cumulative_factors(data, rates, max_years):
+    rates = dict(rates)
+    et_growth = escalation_curve(rates['et'], max_years)
+    opex_mix = sum(share * escalation_curve(rates[part], max_years) for part, share in data.OPEX_SHARES.items())
+    usage_cum = np.concatenate([[0.0], np.cumsum(et_growth)])
+    opex_cum = np.concatenate([[0.0], np.cumsum(et_growth * opex_mix)])
+    usage_cum.flags.writeable = False
+    opex_cum.flags.writeable = False
+    return usage_cum, opex_cum
+
+
+def _rates_key(data, rates):
+    merged = {**data.ESCALATION_RATES, **(rates or {})}
+    return tuple(sorted((k, tuple(np.atleast_1d(v).tolist())) for k, v in merged.items()))
+
+
+def cumulative_factors(rates=None, max_years=None, data=None):
+    """Cumulative usage and opex multipliers indexed by horizon length (0..max_years).
+
+    usage over a horizon is usage_per_year * usage_cum[years], and opex is the
+    year-1 water bill * opex_cum[years]. Unspecified rates fall back to
+    ESCALATION_RATES. Results are cached per data snapshot, so each rate set
+    is built once and a reload starts from fresh entries.
+    """
+    data = data or _current
+    return _cumulative_factors(data, _rates_key(data, rates), max_years or data.MAX_YEARS)
+
+
+@lru_cache(maxsize=32)
+def _grid_cumulative(data, rates, max_years):
+    et_growth = escalation_curve(dict(rates)['et'], max_years)
+    curves = np.stack([escalation_curve(data.GRID_DECARBONIZATION.get(r, 0.0), max_years) for r in data.GRID_REGIONS]
+                      + [np.ones(max_years)])
+    grid_cum = np.concatenate([np.zeros((len(curves), 1)), np.cumsum(curves * et_growth, axis=1)], axis=1)
+    grid_cum.flags.writeable = False
+    return grid_cum
+
+
+def grid_cumulative(rates=None, max_years=None, data=None):
+    """Cumulative grid-factor multiplier per region, (regions + 1, max_years + 1).
+
+    Combines each region's GRID_DECARBONIZATION trajectory with ET growth, so
+    pumping CO₂ over a horizon is year-1 pumping CO₂ * grid_cum[region, years].
+    """
+    data = data or _current
+    return _grid_cumulative(data, _rates_key(data, rates), max_years or data.MAX_YEARS)
+
+
+# ---------- WATER TARIFFS ----------
+FLAT_MONTHS = np.full(12, 1 / 12)
+
+
+def compile_tariff(tariff, currency, data=None):
+    """Turn a WATER_TARIFFS entry into tier arrays priced in `currency`.
+
+    starts are the tier start volumes, base the charge accumulated at each
+    tier start, so a volume's charge is one searchsorted plus one multiply.
+    """
+    rates = (data or _current).EXCHANGE_RATES_FALLBACK
+    conversion = rates[currency] / rates[tariff['currency']]
+    bounds = [bound for bound, _ in tariff['tiers'][:-1]]
+    starts = np.array([0.0] + bounds, dtype=float)
+    prices = np.array([price for _, price in tariff['tiers']], dtype=float) * conversion
+    base = np.concatenate([[0.0], np.cumsum(np.diff(starts) * prices[:-1])])
+    return {
+        'starts': starts,
+        'prices': prices,
+        'base': base,
+        'fixed': tariff.get('fixed', 0.0) * conversion,
+        'monthly': tariff.get('period', 'monthly') == 'monthly'
+    }
+
+
+@lru_cache(maxsize=256)
+def _tariff_for(data, name, currency):
+    return compile_tariff(data.WATER_TARIFFS[name], currency, data)
+
+
+def tariff_for(name, currency, data=None):
+    """Compiled WATER_TARIFFS entry, cached per (data snapshot, tariff, currency)."""
+    return _tariff_for(data or _current, name, currency)
+
+
+def tariff_charge(volume, tariff):
+    """Charge for each billing-period volume (any array shape), fixed charge included."""
+    volume = np.asarray(volume, dtype=float)
+    tier = np.searchsorted(tariff['starts'], volume, side='right') - 1
+    return tariff['base'][tier] + tariff['prices'][tier] * (volume - tariff['starts'][tier]) + tariff['fixed']
+
+
+def _annual_bill(usage_per_year, tariff, month_weights):
+    if not tariff['monthly']:
+        return tariff_charge(usage_per_year, tariff)
+    monthly = usage_per_year[..., None] * (FLAT_MONTHS if month_weights is None else month_weights)
+    return tariff_charge(monthly, tariff).sum(axis=-1)
+
+
+def water_bill(usage_per_year, tariffs, tariff_idx=None, month_weights=None):
+    """Annual water bill for a (sites, methods) usage array.
+
+    tariffs is one compiled tariff for every site, or a list of compiled
+    tariffs with a per-site tariff_idx. Monthly tariffs bill each month's share
+    of annual usage (month_weights, (12,), even split by default). Sites are
+    grouped by tariff so the loop runs over tariffs, not sites.
+    """
+    usage_per_year = np.asarray(usage_per_year, dtype=float)
+    if isinstance(tariffs, dict):
+        return _annual_bill(usage_per_year, tariffs, month_weights)
+
+    tariff_idx = np.asarray(tariff_idx, dtype=np.intp)
+    bill = np.empty_like(usage_per_year)
+    for t in np.unique(tariff_idx):
+        rows = tariff_idx == t
+        bill[rows] = _annual_bill(usage_per_year[rows], tariffs[t], month_weights)
+    return bill
+
+
+# ---------- EQUIPMENT LIFECYCLE ----------
+def capex_schedule(capital, years, data=None):
+    """Capex events per year for (sites, methods) capital: year 0 is the initial
+    purchase, year t the replacements at the end of year t. Returns (sites, methods, years)."""
+    events = (data or _current).REPLACEMENT_EVENTS[:, :years].copy()
+    events[:, 0] = 1.0
+    return np.asarray(capital, dtype=float)[..., None] * events
+
+
+# ---------- BATCH COST MODEL ----------
+# The model in stages. calculate_batch chains them for a batch of sites; the
+# dependency graph in irrigation_app_graph.py memoizes each stage separately.
+def water_usage(m2, et_mm, kc, data):
+    """Yearly water use in m³ per method, (sites, methods)."""
+    et_m3 = np.asarray(et_mm, dtype=float) * np.asarray(m2, dtype=float) / 1000 * kc
+    return et_m3[..., None] * data.USAGE_FACTORS
+
+
+def base_capital(m2, city_coefficient, data):
+    """Initial capital per method in THB, scaled by area and city coefficient, (sites, methods)."""
+    return (data.BASE_CAPITAL * (np.asarray(m2, dtype=float) / data.UNIT_MULTIPLIERS['Rai'])[..., None]
+            * np.asarray(city_coefficient, dtype=float)[..., None])
+
+
+def capital_cost(m2, rate, city_coefficient, data):
+    """Initial capital per method in the currency of `rate` (units per THB), (sites, methods)."""
+    return base_capital(m2, city_coefficient, data) * np.asarray(rate, dtype=float)[..., None]
+
+
+def yearly_bill(usage_per_year, price, tariff=None, tariff_idx=None):
+    """Year-1 water bill: usage at the flat price, or under the compiled block tariff."""
+    if tariff is None:
+        return usage_per_year * np.asarray(price, dtype=float)[..., None]
+    return water_bill(usage_per_year, tariff, tariff_idx)
+
+
+def yearly_emissions(usage_per_year, emission_factor, data):
+    """(pumping, diesel) kg CO₂ per year; pumping uses the grid factor of each site."""
+    pumping = usage_per_year * data.PUMPING_KWH * np.asarray(emission_factor, dtype=float)[..., None]
+    return pumping, usage_per_year * data.DIESEL_KG_PER_M3
+
+
+def usage_horizon(usage_per_year, years, escalation=None):
+    """(usage multiplier, usage) over the horizon, flat or escalated (see calculate_batch)."""
+    if escalation is None:
+        horizon = np.asarray(years, dtype=float)[..., None]
+    else:
+        # One gather per site picks the whole horizon's cumulative factor
+        horizon = escalation[0][np.asarray(years, dtype=np.intp)][..., None]
+    return horizon, usage_per_year * horizon
+
+
+def opex_horizon(bill, opex_per_year, years, escalation=None):
+    """Opex over the horizon: flat yearly opex, or the year-1 bill times the escalated multiplier."""
+    if escalation is None:
+        return opex_per_year * np.asarray(years, dtype=float)[..., None]
+    return bill * escalation[1][np.asarray(years, dtype=np.intp)][..., None]
+
+
+def replacement_cost(capital, years, lifecycle, data):
+    """Component replacements within the horizon (zero unless lifecycle)."""
+    if lifecycle:
+        return capital * data.REPLACEMENT_BY_YEARS[np.asarray(years, dtype=np.intp)]
+    return np.zeros_like(capital)
+
+
+def calculate_batch(m2, et_mm, city_coefficient, rate, price, years, kc=1.0, escalation=None,
+                    tariff=None, tariff_idx=None, emission_factor=None, grid_cum=None,
+                    lifecycle=False, data=None):
+    """Vectorized version of the per-site cost model.
+
+    All inputs are scalars or arrays of shape (sites,). escalation is the
+    (usage_cum, opex_cum) pair from cumulative_factors; without it usage and
+    prices stay flat over the horizon. tariff (see water_bill) replaces the
+    flat `price` with a block tariff; escalation then scales the year-1 bill.
+    emission_factor is the grid kg CO₂/kWh per site (DEFAULT_GRID_FACTOR when
+    omitted) and grid_cum its cumulative multiplier over the horizon (from
+    grid_cumulative; flat when omitted).
+    lifecycle adds component replacements within the horizon to the total.
+    Returns a dict of (sites, methods) arrays in METHODS order, unrounded;
+    CO₂ is in kg. data is the snapshot to use (the active one by default).
+    """
+    data = data or _current
+    if emission_factor is None:
+        emission_factor = data.DEFAULT_GRID_FACTOR
+
+    usage_per_year = water_usage(m2, et_mm, kc, data)
+    capital = capital_cost(m2, rate, city_coefficient, data)
+    bill = yearly_bill(usage_per_year, price, tariff, tariff_idx)
+    opex_per_year = bill * data.OPEX_RATIO
+
+    # CO₂ from pumping electricity on the local grid and from truck diesel
+    pumping_co2, diesel_co2 = yearly_emissions(usage_per_year, emission_factor, data)
+
+    horizon, usage = usage_horizon(usage_per_year, years, escalation)
+    opex = opex_horizon(bill, opex_per_year, years, escalation)
+    grid_horizon = horizon if grid_cum is None else np.asarray(grid_cum, dtype=float)[..., None]
+    replacement = replacement_cost(capital, years, lifecycle, data)
+
+    return {
+        'usage_per_year': usage_per_year,
+        'usage': usage,
+        'capital': capital,
+        'opex_per_year': opex_per_year,
+        'opex': opex,
+        'replacement': replacement,
+        'total': capital + replacement + opex if lifecycle else capital + opex,
+        'co2_per_year': pumping_co2 + diesel_co2,
+        'co2': pumping_co2 * grid_horizon + diesel_co2 * horizon
+    }
+
+
+def site_inputs(area, unit, years, city, price, currency, plant_idx=None, plant_fractions=None,
+                escalation_rates=None, tariff=None, lifecycle=False, kc=None, data=None):
+    """calculate_batch keyword arguments for sites given as in calculate_costs (arrays of names/values).
+
+    kc, when given (e.g. from plant_mix_kc), is used instead of plant_idx.
+    """
+    data = data or _current
+    city_idx = index_of(city, data.CITY_INDEX)
+    currency_idx = index_of(currency, data.CURRENCY_INDEX)
+    m2 = np.asarray(area, dtype=float) * data.UNIT_M2[index_of(unit, data.UNIT_INDEX)]
+    if kc is None:
+        kc = 1.0 if plant_idx is None else landscape_kc(plant_idx, plant_fractions, data=data)
+    compiled = tariff_idx = None
+    if tariff is not None:
+        # One compiled tariff per currency in the batch; water_bill groups the sites by it
+        used, tariff_idx = np.unique(currency_idx, return_inverse=True)
+        compiled = [tariff_for(tariff, data.CURRENCIES[c], data) for c in used]
+        if len(compiled) == 1:
+            compiled, tariff_idx = compiled[0], None
+    region_idx = data.CITY_REGION[city_idx]
+    year_idx = np.broadcast_to(np.asarray(years, dtype=np.intp), city_idx.shape)
+    return dict(
+        m2=m2, et_mm=data.ET_MM[city_idx], city_coefficient=data.CITY_COEFFICIENTS[city_idx],
+        rate=data.RATES[currency_idx], price=price, years=years, kc=kc,
+        escalation=None if escalation_rates is None else cumulative_factors(escalation_rates, data=data),
+        tariff=compiled, tariff_idx=tariff_idx,
+        emission_factor=data.GRID_FACTORS[region_idx],
+        grid_cum=grid_cumulative(escalation_rates, data=data)[region_idx, year_idx],
+        lifecycle=lifecycle, data=data
+    )
+
+
+def calculate_sites(area, unit, years, city, price, currency, plant_idx=None, plant_fractions=None,
+                    escalation_rates=None, tariff=None, lifecycle=False, data=None):
+    """Batch entry point taking the same inputs as calculate_costs, as arrays of names/values.
+
+    tariff is an optional WATER_TARIFFS name for all sites, priced in each site's currency.
+    The whole batch uses one data snapshot, even if a reload lands meanwhile.
+    """
+    return calculate_batch(**site_inputs(area, unit, years, city, price, currency, plant_idx, plant_fractions,
+                                         escalation_rates, tariff, lifecycle, data=data))
+
+
+def savings_summary(batch, base_idx, comp_idx):
+    """Per-site savings of the comparison method over the base method.
+
+    base_idx / comp_idx are METHODS positions, scalars or (sites,) arrays.
+    Horizon savings come from the horizon totals, so they include escalation
+    and replacements when the batch was run with them. payback is NaN where
+    there is nothing to pay back. CO₂ savings are in kg. With a money_batch
+    result the money savings are exact int64 minor units.
+    """
+    sites = batch['capital'].shape[0]
+    base_idx = np.broadcast_to(np.asarray(base_idx, dtype=np.intp), (sites,))[:, None]
+    comp_idx = np.broadcast_to(np.asarray(comp_idx, dtype=np.intp), (sites,))[:, None]
+
+    def diff(key):
+        values = batch[key]
+        return (np.take_along_axis(values, base_idx, axis=1) - np.take_along_axis(values, comp_idx, axis=1))[:, 0]
+
+    annual_savings = diff('opex_per_year')
+    capex_diff = diff('capital')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback = np.where((annual_savings > 0) & (capex_diff > 0), capex_diff / annual_savings, np.nan)
+    return {
+        'annual_savings': annual_savings,
+        'total_savings': diff('total') - capex_diff,
+        'capex_diff': capex_diff,
+        'payback': payback,
+        'co2_saving': diff('co2')
+    }
+
+
+# ---------- MONEY ----------
+# Batch money is held as int64 counts of each currency's minor unit (satang,
+# cents; JPY, KRW and VND have none, see CURRENCY_DECIMALS), so sums over any
+# number of sites are exact and match the single-site figures. Amounts are
+# rounded once, half to even, when they leave the float model.
+def to_minor(amounts, minor_units):
+    """Amounts as int64 minor units; minor_units comes from data.MINOR_UNITS."""
+    scaled = np.multiply(amounts, minor_units, dtype=float)
+    return np.rint(scaled, out=scaled).astype(np.int64)
+
+
+def from_minor(counts, minor_units):
+    """Minor-unit counts back to amounts, for display and export."""
+    return np.asarray(counts) / minor_units
+
+
+def convert_minor(counts, from_units, to_units, rate):
+    """Minor units of one currency in minor units of another; rate is target per source unit."""
+    return to_minor(from_minor(counts, from_units) * rate, to_units)
+
+
+def money_total(capital, opex_per_year, replacement, opex, years, minor_units, flat):
+    """Horizon total in minor units from rounded capital and yearly opex (both minor units).
+
+    Flat totals are capital + yearly opex * years, so they equal the yearly
+    figures shown; escalated or lifecycle totals add the rounded replacements
+    and horizon opex.
+    """
+    if flat:
+        return capital + opex_per_year * np.asarray(years, dtype=np.int64)[..., None]
+    return capital + to_minor(replacement + opex, minor_units)
+
+
+def in_all_currencies(amounts, currency_idx, data=None):
+    """Amounts of sites priced in currency_idx, in every currency: one broadcast over
+    the cross-rate matrix, (..., currencies) in CURRENCIES order."""
+    data = data or _current
+    return np.asarray(amounts, dtype=float)[..., None] * data.CROSS_RATES[currency_idx]
+
+
+def minor_in_all_currencies(counts, currency_idx, data=None):
+    """Minor-unit counts of sites priced in currency_idx, as int64 minor units of every
+    currency (each rounded as by to_minor), (sites, currencies)."""
+    data = data or _current
+    return convert_minor(np.asarray(counts)[..., None], data.MINOR_UNITS[currency_idx][..., None], data.MINOR_UNITS,
+                         data.CROSS_RATES[currency_idx])
+
+
+def money_batch(batch, years, minor_units, flat):
+    """A calculate_batch result with capital, opex_per_year and total in int64 minor units.
+
+    minor_units is per site (or one value); flat means no escalation and no
+    lifecycle, as in calculate_costs.
+    """
+    minor = np.asarray(minor_units)[..., None]
+    capital = to_minor(batch['capital'], minor)
+    opex_per_year = to_minor(batch['opex_per_year'], minor)
+    total = money_total(capital, opex_per_year, batch['replacement'], batch['opex'], years, minor, flat)
+    return dict(batch, capital=capital, opex_per_year=opex_per_year, total=total)
@@ -0,0 +1,114 @@
+# Float vs fixed-point money in batch runs.
+#
+#   python irrigation_app_money_benchmark.py [sites]
+#
+# Runs the same synthetic portfolio through the batch model twice: money as
+# float64 (summed as floats) and as int64 minor units (money_batch, summed
+# exactly). Prints the time of each path, the time of the aggregation alone,
+# and how far float totals (rows rounded for display, then summed) are from
+# the exact ones, and the cost of converting a money column into every
+# currency at once (the portfolio's all-currency totals). Fails when exact
+# aggregation is slower than summing floats.
+import math
+import sys
+import time
+
+import numpy as np
+
+import irrigation_app_model as model
+
+REPEATS = 5
+MONEY = ('annual_savings', 'total_savings', 'capex_diff')
+
+
+def _best(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def _sites(n, data, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        'area': np.round(rng.uniform(50, 50000, n), 1),
+        'years': rng.integers(1, 21, n),
+        'city': np.asarray(data.CITIES, dtype=object)[rng.integers(0, len(data.CITIES), n)],
+        'price': np.round(rng.uniform(2, 40, n), 1),
+        'currency_idx': rng.integers(0, len(data.CURRENCIES), n),
+        'base': rng.integers(0, 2, n),  # Manual or Truck
+        'comp': rng.integers(2, 4, n),  # Auto or ET-Based
+    }
+
+
+def benchmark(n=2_000_000, report_currency='THB'):
+    data = model.current()
+    sites = _sites(n, data)
+    currency_idx = sites['currency_idx']
+    report_idx = data.CURRENCY_INDEX[report_currency]
+    to_report = data.CROSS_RATES[currency_idx, report_idx]
+    site_minor, report_minor = data.MINOR_UNITS[currency_idx], data.MINOR_UNITS[report_idx]
+
+    def model_run():
+        return model.calculate_sites(sites['area'], 'm²', sites['years'], sites['city'], sites['price'],
+                                     np.asarray(data.CURRENCIES, dtype=object)[currency_idx], data=data)
+
+    def float_path():
+        summary = model.savings_summary(model_run(), sites['base'], sites['comp'])
+        return {k: summary[k] * to_report for k in MONEY}
+
+    def fixed_path():
+        batch = model.money_batch(model_run(), sites['years'], site_minor, flat=True)
+        summary = model.savings_summary(batch, sites['base'], sites['comp'])
+        return {k: model.convert_minor(summary[k], site_minor, report_minor, to_report) for k in MONEY}
+
+    float_s, floats = _best(float_path)
+    fixed_s, fixed = _best(fixed_path)
+    float_sum_s, float_totals = _best(lambda: {k: floats[k].sum() for k in MONEY})
+    fixed_sum_s, fixed_totals = _best(lambda: {k: int(fixed[k].sum()) for k in MONEY})
+    # The float alternative to exact sums, for scale
+    fsum_s, _ = _best(lambda: {k: math.fsum(floats[k]) for k in MONEY})
+    # One column from site currencies into all of them (sites x currencies), summed per currency
+    summary = model.savings_summary(model.money_batch(model_run(), sites['years'], site_minor, flat=True),
+                                    sites['base'], sites['comp'])
+    all_s, _ = _best(lambda: model.minor_in_all_currencies(summary['total_savings'], currency_idx, data).sum(axis=0))
+
+    # What a float pipeline reports (rows rounded for display, then summed) vs the exact total
+    drift = {k: float(np.round(floats[k], 2).sum()) - fixed_totals[k] / report_minor for k in MONEY}
+    return {
+        'sites': n,
+        'float_path_s': float_s,
+        'fixed_path_s': fixed_s,
+        'float_sum_ms': float_sum_s * 1000,
+        'fixed_sum_ms': fixed_sum_s * 1000,
+        'fsum_ms': fsum_s * 1000,
+        'all_currencies_ms': all_s * 1000,
+        'currencies': len(data.CURRENCIES),
+        'drift': drift,
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    r = benchmark(n)
+    print(f"{r['sites']:,} sites, best of {REPEATS}")
+    print(f"{'path':<28}{'seconds':>10}")
+    print(f"{'float64 money':<28}{r['float_path_s']:>10.3f}")
+    print(f"{'int64 minor units':<28}{r['fixed_path_s']:>10.3f}")
+    print(f"{'aggregation (3 columns)':<28}{'ms':>10}")
+    print(f"{'float64 sum':<28}{r['float_sum_ms']:>10.2f}")
+    print(f"{'int64 sum (exact)':<28}{r['fixed_sum_ms']:>10.2f}")
+    print(f"{'math.fsum':<28}{r['fsum_ms']:>10.2f}")
+    print(f"{'all currencies, 1 column':<28}{r['all_currencies_ms']:>10.2f}  ({r['currencies']} currencies)")
+    for k, d in r['drift'].items():
+        print(f"float total - exact total, {k}: {d:+,.2f}")
+    if r['fixed_sum_ms'] > r['float_sum_ms'] * 1.2:
+        print("FAIL: exact aggregation is slower than the float path")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# Budget-constrained retrofit planning for a portfolio.
+#
+#   python irrigation_app_optimizer.py sites.csv --budget 5000000 [--currency THB] [--objective water|co2]
+#
+# Chooses which sites of an uploaded site list (see irrigation_app_portfolio)
+# to upgrade, and to which method, so that water or CO₂ savings over the
+# sites' horizons are largest for a capex budget. Each site keeps its current
+# method (base_method) or takes one upgrade: a multiple-choice knapsack.
+#
+# Greedy: every site's upgrades are reduced to their upper convex hull of
+# (cost, savings), and the hull steps of all sites are sorted by savings per
+# cost. Each prefix of that order is an optimal plan for exactly its cost, so
+# the prefixes are the Pareto frontier of budget versus savings, and the
+# fractional next step bounds what any plan within the budget can save.
+# DP: the sites whose steps lie around the budget's break point are decided
+# again by dynamic programming over the budget left by the others, on a cost
+# grid rounded up so every plan it returns fits the budget.
+import argparse
+import sys
+
+import numpy as np
+
+import irrigation_app_model as model
+
+# Savings to maximize -> batch output (per site, over its horizon)
+OBJECTIVES = {'water': 'usage', 'co2': 'co2'}
+CORE_STEPS = 1000  # hull steps on each side of the break point re-decided by DP
+DP_BUCKETS = 4000  # budget grid of the DP
+FRONTIER_POINTS = 200
+
+
+def retrofit_options(df, currency, objective='water', data=None):
+    """(cost, savings) of moving each site to each method, (sites, methods).
+
+    cost is the upgrade's capital in int64 minor units of `currency` (the
+    current system is already paid for); savings are the reduction of the
+    objective over the site's horizon (m³ or kg CO₂). Options that save
+    nothing, including the current method, have savings 0.
+    """
+    data = data or model.current()
+    plant_idx = model.index_of(df['plant_type'], data.PLANT_INDEX) if 'plant_type' in df.columns else None
+    batch = model.calculate_sites(
+        df['area'].to_numpy(float), df['unit'], df['years'].to_numpy(int), df['city'],
+        df['water_price'].to_numpy(float), df['currency'], plant_idx=plant_idx, data=data
+    )
+    base_idx = model.index_of(df['base_method'], {m: i for i, m in enumerate(data.METHODS)})[:, None]
+    values = batch[OBJECTIVES[objective]]
+    savings = np.maximum(np.take_along_axis(values, base_idx, axis=1) - values, 0.0)
+    site_idx = model.index_of(df['currency'], data.CURRENCY_INDEX)
+    report_idx = data.CURRENCY_INDEX[currency]
+    cost = model.to_minor(batch['capital'] * data.CROSS_RATES[site_idx, report_idx][:, None],
+                          data.MINOR_UNITS[report_idx])
+    return cost, savings
+
+
+def hull_steps(cost, savings):
+    """Upgrade steps along each site's upper convex hull, in greedy order.
+
+    Returns (site, option, step cost, step savings) arrays sorted by savings
+    per cost, best first; a site's steps keep their hull order.
+    """
+    sites = np.arange(cost.shape[0])
+    at_cost = np.zeros(len(sites), dtype=np.int64)
+    at_savings = np.zeros(len(sites))
+    steps = []
+    for step in range(cost.shape[1]):
+        # From the current hull point, the option with the steepest gain (the farthest on ties)
+        gain = savings - at_savings[:, None]
+        extra = cost - at_cost[:, None]
+        usable = (gain > 0) & (extra >= 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(usable, np.where(extra > 0, gain / extra, np.inf), -1.0)
+        best = np.max(slope, axis=1, keepdims=True)
+        option = np.argmax(np.where(slope == best, savings, -1.0), axis=1)
+        found = best[:, 0] >= 0
+        if not found.any():
+            break
+        s, o = sites[found], option[found]
+        steps.append((s, o, cost[s, o] - at_cost[s], savings[s, o] - at_savings[s], slope[s, o],
+                      np.full(len(s), step)))
+        at_cost[s], at_savings[s] = cost[s, o], savings[s, o]
+    if not steps:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0)
+    site, option, step_cost, step_savings, slope, order = (np.concatenate(parts) for parts in zip(*steps))
+    ranked = np.lexsort((order, -slope))
+    return site[ranked], option[ranked], step_cost[ranked], step_savings[ranked]
+
+
+def _dp(cost, savings, capacity):
+    """Best choice per site (-1 to stay) within capacity, by DP on a rounded-up cost grid."""
+    unit = max(1, -(-int(capacity) // DP_BUCKETS))
+    slots = int(capacity) // unit
+    weights = -(-cost // unit)  # rounded up, so plans fit the exact capacity
+    best = np.zeros(slots + 1)
+    taken = np.full((cost.shape[0], slots + 1), -1, dtype=np.int8)
+    for i in range(cost.shape[0]):
+        previous = best.copy()
+        for j in np.flatnonzero(savings[i] > 0):
+            w = weights[i, j]
+            if w > slots:
+                continue
+            candidate = previous[:slots + 1 - w] + savings[i, j]
+            better = candidate > best[w:]
+            best[w:] = np.where(better, candidate, best[w:])
+            taken[i, w:][better] = j
+    choice = np.full(cost.shape[0], -1)
+    w = slots
+    for i in range(cost.shape[0] - 1, -1, -1):
+        j = taken[i, w]
+        if j >= 0:
+            choice[i] = j
+            w -= weights[i, j]
+    return choice
+
+
+def _downsample(values, points):
+    if len(values) <= points:
+        return values
+    return values[np.unique(np.linspace(0, len(values) - 1, points).round().astype(int))]
+
+
+def optimize_retrofits(cost, savings, budget):
+    """Plan for a budget in the same minor units as cost.
+
+    Returns a dict: 'choice' (sites,) method index per site (-1 keeps the
+    current method), 'total_cost' and 'total_savings' of the plan,
+    'upper_bound' on the savings any plan within the budget reaches, and the
+    'frontier' of optimal plans as {'budget', 'savings', 'sites'} arrays.
+    """
+    cost = np.asarray(cost, dtype=np.int64)
+    savings = np.asarray(savings, dtype=float)
+    sites = cost.shape[0]
+    site, option, step_cost, step_savings = hull_steps(cost, savings)
+    spent = np.cumsum(step_cost)
+    saved = np.cumsum(step_savings)
+
+    # Greedy: the longest prefix of steps within the budget
+    fits = int(np.searchsorted(spent, budget, side='right'))
+    choice = np.full(sites, -1)
+    choice[site[:fits]] = option[:fits]  # later steps of a site overwrite earlier ones
+    upper = float(saved[fits - 1]) if fits else 0.0
+    if fits < len(spent):
+        left = budget - (spent[fits - 1] if fits else 0)
+        upper += float(step_savings[fits]) * left / step_cost[fits] if step_cost[fits] else float(step_savings[fits])
+
+    # DP over the sites around the break point, with what the other sites leave
+    core = np.unique(site[max(0, fits - CORE_STEPS):fits + CORE_STEPS])
+    if len(core):
+        rest = np.ones(sites, dtype=bool)
+        rest[core] = False
+        fixed = choice[rest]
+        fixed_cost = int(cost[np.flatnonzero(rest)[fixed >= 0], fixed[fixed >= 0]].sum())
+        dp_choice = _dp(cost[core], savings[core], budget - fixed_cost)
+
+        def core_savings(picks):
+            return float(savings[core[picks >= 0], picks[picks >= 0]].sum())
+
+        if core_savings(dp_choice) > core_savings(choice[core]):
+            choice[core] = dp_choice
+
+    chosen = choice >= 0
+    frontier_idx = _downsample(np.arange(len(spent)), FRONTIER_POINTS)
+    first_step = np.zeros(len(spent), dtype=bool)
+    _, first = np.unique(site, return_index=True)
+    first_step[first] = True
+    return {
+        'choice': choice,
+        'total_cost': int(cost[chosen, choice[chosen]].sum()),
+        'total_savings': float(savings[chosen, choice[chosen]].sum()),
+        'upper_bound': upper,
+        'frontier': {
+            'budget': np.concatenate([[0], spent[frontier_idx]]),
+            'savings': np.concatenate([[0.0], saved[frontier_idx]]),
+            'sites': np.concatenate([[0], np.cumsum(first_step)[frontier_idx]]),
+        },
+    }
+
+
+def main():
+    from irrigation_app_portfolio import read_portfolio
+
+    parser = argparse.ArgumentParser(description='Choose site upgrades that save the most within a capex budget.')
+    parser.add_argument('sites', help='site list (CSV / XLSX, as on the portfolio page)')
+    parser.add_argument('--budget', type=float, required=True, help='capex budget in --currency')
+    parser.add_argument('--currency', default='THB')
+    parser.add_argument('--objective', choices=sorted(OBJECTIVES), default='water')
+    args = parser.parse_args()
+
+    data = model.current()
+    with open(args.sites, 'rb') as f:
+        df = read_portfolio(f.read(), args.sites)
+    minor = int(data.MINOR_UNITS[data.CURRENCY_INDEX[args.currency]])
+    cost, savings = retrofit_options(df, args.currency, args.objective, data)
+    plan = optimize_retrofits(cost, savings, round(args.budget * minor))
+    unit = 'm³' if args.objective == 'water' else 'kg CO₂'
+    print(f"{int((plan['choice'] >= 0).sum()):,} of {len(df):,} sites upgraded for "
+          f"{args.currency} {plan['total_cost'] / minor:,.2f}: {plan['total_savings']:,.0f} {unit} saved "
+          f"(at most {plan['upper_bound']:,.0f})")
+    for method_idx, count in zip(*np.unique(plan['choice'][plan['choice'] >= 0], return_counts=True)):
+        print(f"  {data.METHODS[method_idx]:<10}{count:>8,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,362 @@
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import irrigation_app_jobs as jobs
+from irrigation_app_optimizer import OBJECTIVES, optimize_retrofits, retrofit_options
+from irrigation_app_cache import get_artifact_cache
+from irrigation_app_sessions import current_session_id, get_session_store
+import irrigation_app_model as model
+from irrigation_app_translations import get_label
+
+# ---------- PORTFOLIO DEFAULTS ----------
+# Columns that may be left out of an uploaded site list, with the value used instead
+PORTFOLIO_DEFAULTS = {
+    'site': '',
+    'unit': 'm²',
+    'years': 3,
+    'currency': 'THB',
+    'water_price': 10.5,
+    'base_method': 'Manual',
+    'comparison_method': 'Auto'
+}
+PORTFOLIO_REQUIRED = ['area', 'city']
+# Planting of a site whose optional plant_type is left blank
+DEFAULT_PLANT_TYPE = 'Reference'
+# Invalid values listed in the upload error before the rest are only counted
+MAX_ROW_ERRORS = 10
+# Held as int64 minor units of each site's currency, so portfolio totals are exact
+MONEY_COLUMNS = ['annual_savings', 'total_savings', 'capex_diff']
+CHUNK_SIZE = 5000
+PAGE_SIZES = [50, 100, 500]
+
+
+def read_portfolio(data, filename, tables=None):
+    """Read an uploaded CSV/XLSX site list and fill in optional columns.
+
+    Raises ValueError naming the rows with values the model cannot use
+    (unknown names, areas, prices or horizons out of range), checked against
+    the tables snapshot (the active one by default).
+    """
+    if filename.lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(io.BytesIO(data))  # needs openpyxl
+    else:
+        df = pd.read_csv(io.BytesIO(data))
+    df.columns = [str(c).strip().lower().replace(' ', '_') for c in df.columns]
+
+    missing = [c for c in PORTFOLIO_REQUIRED if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    for column, default in PORTFOLIO_DEFAULTS.items():
+        if column not in df.columns:
+            df[column] = default
+        else:
+            df[column] = df[column].fillna(default)
+    if 'plant_type' in df.columns:
+        df['plant_type'] = df['plant_type'].fillna(DEFAULT_PLANT_TYPE)
+
+    errors = _row_errors(df, tables or model.current())
+    if errors:
+        listed = '; '.join(errors[:MAX_ROW_ERRORS])
+        more = f"; and {len(errors) - MAX_ROW_ERRORS} more" if len(errors) > MAX_ROW_ERRORS else ''
+        raise ValueError(f"{len(errors)} invalid value(s): {listed}{more}")
+    return df
+
+
+def _row_errors(df, data):
+    """'Row n: ...' for every value the model cannot use, rows numbered from 1 in file order."""
+    methods = {m: i for i, m in enumerate(data.METHODS)}
+    names = {'city': data.CITY_INDEX, 'unit': data.UNIT_INDEX, 'currency': data.CURRENCY_INDEX,
+             'base_method': methods, 'comparison_method': methods, 'plant_type': data.PLANT_INDEX}
+    area = pd.to_numeric(df['area'], errors='coerce')
+    price = pd.to_numeric(df['water_price'], errors='coerce')
+    years = pd.to_numeric(df['years'], errors='coerce')
+    checks = [(column, ~df[column].astype(str).isin(list(index)), 'is unknown')
+              for column, index in names.items() if column in df.columns]
+    checks += [
+        ('area', ~(area > 0), 'is not a positive number'),
+        ('water_price', ~(price >= 0), 'is not a price'),
+        ('years', ~((years >= 1) & (years <= data.MAX_YEARS) & (years == years.round())),
+         f'is not a whole number of years from 1 to {data.MAX_YEARS}'),
+    ]
+    errors = [(i, f"Row {i + 1}: {column} '{df[column].iloc[i]}' {message}")
+              for column, bad, message in checks for i in np.flatnonzero(bad.to_numpy())]
+    return [message for _, message in sorted(errors, key=lambda e: e[0])]
+
+
+def evaluate_portfolio(df, data=None):
+    """Run one chunk of sites through the batch model.
+
+    Each site is priced and rounded in its own currency, as the calculator
+    does; money columns (MONEY_COLUMNS) stay in int64 minor units of that
+    currency, and in_report_currency() converts them for any report currency.
+    """
+    data = data or model.current()
+    plant_idx = model.index_of(df['plant_type'], data.PLANT_INDEX) if 'plant_type' in df.columns else None
+    years = df['years'].to_numpy(int)
+    currency_idx = model.index_of(df['currency'], data.CURRENCY_INDEX)
+    batch = model.calculate_sites(
+        df['area'].to_numpy(float), df['unit'], years, df['city'],
+        df['water_price'].to_numpy(float), df['currency'], plant_idx=plant_idx, data=data
+    )
+    # Portfolio sites have flat prices and no replacements
+    batch = model.money_batch(batch, years, data.MINOR_UNITS[currency_idx], flat=True)
+    method_index = {m: i for i, m in enumerate(data.METHODS)}
+    summary = model.savings_summary(
+        batch, model.index_of(df['base_method'], method_index), model.index_of(df['comparison_method'], method_index)
+    )
+    return pd.DataFrame({
+        'site': df['site'].astype(str).to_numpy(),
+        'city': df['city'].to_numpy(),
+        'currency': df['currency'].to_numpy(),
+        'area_m2': df['area'].to_numpy(float) * data.UNIT_M2[model.index_of(df['unit'], data.UNIT_INDEX)],
+        'years': df['years'].to_numpy(int),
+        'base_method': df['base_method'].to_numpy(),
+        'comparison_method': df['comparison_method'].to_numpy(),
+        'annual_savings': summary['annual_savings'],
+        'total_savings': summary['total_savings'],
+        'capex_diff': summary['capex_diff'],
+        'payback_years': summary['payback'],
+        'co2_saving_t': summary['co2_saving'] / 1000
+    })
+
+
+def in_report_currency(results, currency, data=None):
+    """Copy of portfolio results with the money columns in int64 minor units of currency."""
+    data = data or model.current()
+    currency_idx = model.index_of(results['currency'], data.CURRENCY_INDEX)
+    report_idx = data.CURRENCY_INDEX[currency]
+    return results.assign(currency=currency, **{
+        column: model.convert_minor(results[column].to_numpy(), data.MINOR_UNITS[currency_idx],
+                                    data.MINOR_UNITS[report_idx], data.CROSS_RATES[currency_idx, report_idx])
+        for column in MONEY_COLUMNS
+    })
+
+
+def currency_totals(results, data=None):
+    """Exact totals of the money columns in every currency, {column: int64 minor units per currency}.
+
+    Sites are converted into all currencies at once (sites x currencies, one
+    broadcast over the cross-rate matrix per chunk) and rounded per site as
+    in_report_currency() does, so each total equals the sum of that report.
+    """
+    data = data or model.current()
+    currency_idx = model.index_of(results['currency'], data.CURRENCY_INDEX)
+    totals = {column: np.zeros(len(data.CURRENCIES), dtype=np.int64) for column in MONEY_COLUMNS}
+    for start in range(0, len(results), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        for column in MONEY_COLUMNS:
+            totals[column] += model.minor_in_all_currencies(results[column].to_numpy()[chunk], currency_idx[chunk],
+                                                            data).sum(axis=0)
+    return totals
+
+
+def in_currency_units(results, minor_units):
+    """Copy of portfolio results with the money columns as amounts, for display and export."""
+    return results.assign(**{column: model.from_minor(results[column].to_numpy(), minor_units)
+                             for column in MONEY_COLUMNS})
+
+
+def run_portfolio(data, filename):
+    """Job body: parse the upload and process it chunk by chunk, publishing progress."""
+    # Pool workers outlive reloads in the server process, so read the data file again;
+    # the upload is checked against and every chunk uses this one snapshot. An invalid,
+    # missing or unreadable data file keeps the data the worker already has
+    try:
+        tables = model.reload()
+    except (OSError, ValueError):
+        tables = model.current()
+    df = read_portfolio(data, filename, tables)
+    parts = []
+    for start in range(0, len(df), CHUNK_SIZE):
+        jobs.report_progress(start, len(df))
+        parts.append(evaluate_portfolio(df.iloc[start:start + CHUNK_SIZE], tables))
+    jobs.report_progress(len(df), len(df))
+    return pd.concat(parts, ignore_index=True) if parts else None
+
+
+def start_portfolio_job(data, filename):
+    """Queue the upload on the shared scheduler; the same file and reference data map to the same job.
+
+    Results do not depend on the report currency, so switching it never reruns the job.
+    """
+    key = 'portfolio-' + hashlib.sha256(data + model.current().version.encode()).hexdigest()[:32]
+    return jobs.get_scheduler().submit(run_portfolio, data, filename, priority=5, key=key)
+
+
+def run_retrofit_options(data, filename, currency, objective, tables):
+    """Job body: the optimizer's upgrade options for every uploaded site.
+
+    tables are the page's reference tables, so the upload is checked and
+    priced with the snapshot the page shows the plan with.
+    """
+    snapshot = model.ModelData(tables)
+    sites = read_portfolio(data, filename, snapshot)
+    cost, savings = retrofit_options(sites, currency, objective, snapshot)
+    return sites[['site', 'city', 'base_method']], cost, savings
+
+
+def retrofit_job_key(data, currency, objective, snapshot):
+    """Job key of the optimizer's options for an upload; one job per upload, currency, objective and data."""
+    options = f"{currency}|{objective}|{snapshot.version}".encode()
+    return 'retrofit-' + hashlib.sha256(data + options).hexdigest()[:32]
+
+
+def start_retrofit_job(data, filename, currency, objective, snapshot):
+    """Queue the optimizer's options on the shared scheduler, priced with the page's snapshot."""
+    return jobs.get_scheduler().submit(run_retrofit_options, data, filename, currency, objective, snapshot.tables,
+                                       priority=5, key=retrofit_job_key(data, currency, objective, snapshot))
+
+
+@st.fragment(run_every=1.0)
+def _portfolio_progress(labels, job_id):
+    """Polls the running job without blocking the rest of the page."""
+    status = jobs.get_scheduler().status(job_id)
+    st.progress(status['progress'] or 0.0, text=f"{get_label(labels, 'portfolio_processing')} ({status['status']})")
+    if st.button(get_label(labels, 'portfolio_cancel')):
+        jobs.get_scheduler().cancel(job_id)
+    if status['status'] not in (jobs.QUEUED, jobs.RUNNING):
+        st.rerun()
+
+
+@st.fragment
+def _retrofit_optimizer(labels, upload, currency, data):
+    """Budget-constrained upgrade plan for the uploaded sites; reruns on its own."""
+    minor = int(data.MINOR_UNITS[data.CURRENCY_INDEX[currency]])
+    decimals = data.CURRENCY_DECIMALS.get(currency, 2)
+    with st.expander(get_label(labels, 'optimizer_title')):
+        c1, c2 = st.columns(2)
+        with c1:
+            budget = st.number_input(f"{get_label(labels, 'optimizer_budget')} ({currency})", min_value=0.0,
+                                     value=1_000_000.0, step=100_000.0)
+        with c2:
+            objective = st.selectbox(get_label(labels, 'optimizer_objective'), list(OBJECTIVES),
+                                     format_func=lambda o: get_label(labels, f'optimizer_{o}'))
+        # Options depend on the upload, currency and objective only; keep them while the budget moves.
+        # They are computed by a job on the shared scheduler, so a large upload does not block the session
+        session_store, session_id = get_session_store(), current_session_id()
+        key = retrofit_job_key(upload.getvalue(), currency, objective, data)
+        cached = session_store.get(session_id, 'retrofit_options')
+        if cached is None or cached[0] != key:
+            scheduler = jobs.get_scheduler()
+            status = scheduler.status(key)
+            result = scheduler.result(key) if status['status'] == jobs.DONE else None
+            if result is None and status['status'] not in (jobs.QUEUED, jobs.RUNNING, jobs.FAILED):
+                start_retrofit_job(upload.getvalue(), upload.name, currency, objective, data)
+                status = scheduler.status(key)
+            if status['status'] == jobs.FAILED:
+                st.error(status['error'])
+                return
+            if result is None:
+                _portfolio_progress(labels, key)
+                return
+            cached = (key, *result)
+            session_store.put(session_id, 'retrofit_options', cached)
+        _, sites, cost, savings = cached
+        plan = optimize_retrofits(cost, savings, round(budget * minor))
+
+        unit = 'm³' if objective == 'water' else 't CO₂'
+        scale = 1 if objective == 'water' else 1000
+        chosen = plan['choice'] >= 0
+        m1, m2, m3 = st.columns(3)
+        m1.metric(get_label(labels, 'optimizer_sites'), f"{int(chosen.sum()):,} / {len(sites):,}")
+        m2.metric(get_label(labels, 'optimizer_cost'), f"{currency} {plan['total_cost'] / minor:,.{decimals}f}")
+        m3.metric(get_label(labels, f'optimizer_{objective}'), f"{plan['total_savings'] / scale:,.0f} {unit}")
+        frontier = plan['frontier']
+        st.line_chart(pd.DataFrame({
+            f"{get_label(labels, 'optimizer_budget')} ({currency})": frontier['budget'] / minor,
+            f"{get_label(labels, f'optimizer_{objective}')} ({unit})": frontier['savings'] / scale,
+        }), x=f"{get_label(labels, 'optimizer_budget')} ({currency})")
+        picks = np.flatnonzero(chosen)
+        st.dataframe(sites.iloc[picks].assign(
+            upgrade=np.asarray(data.METHODS, dtype=object)[plan['choice'][picks]],
+            cost=cost[picks, plan['choice'][picks]] / minor,
+            savings=savings[picks, plan['choice'][picks]] / scale,
+        ), use_container_width=True)
+
+
+def render_portfolio_page(labels):
+    st.markdown(f"### {get_label(labels, 'portfolio_title')}")
+    st.markdown(get_label(labels, 'portfolio_description'))
+
+    upload = st.file_uploader(get_label(labels, 'portfolio_upload'), type=['csv', 'xlsx'])
+    data = model.current()
+    report_currency = st.selectbox(get_label(labels, 'input_currency'), options=data.CURRENCIES,
+                                   index=data.CURRENCY_INDEX['THB'], key='portfolio_currency')
+
+    scheduler = jobs.get_scheduler()
+    job_id = st.session_state.get('portfolio_job')
+    status = scheduler.status(job_id) if job_id else None
+    running = status is not None and status['status'] in (jobs.QUEUED, jobs.RUNNING)
+    if st.button(get_label(labels, 'portfolio_process'), disabled=upload is None or running, use_container_width=True):
+        st.session_state.portfolio_job = job_id = start_portfolio_job(upload.getvalue(), upload.name)
+        status = scheduler.status(job_id)
+        running = status['status'] in (jobs.QUEUED, jobs.RUNNING)
+
+    if status is None:
+        return
+    if running:
+        _portfolio_progress(labels, job_id)
+        return
+    if status['status'] == jobs.FAILED:
+        st.error(status['error'])
+        return
+    if status['status'] == jobs.CANCELLED:
+        st.warning(get_label(labels, 'portfolio_cancelled'))
+        return
+
+    # Keep the loaded result and its totals in every currency for this session, so paging
+    # and switching the report currency do not re-read the job store or re-sum the sites;
+    # they are accounted and dropped with the session's other payloads when idle
+    session_store, session_id = get_session_store(), current_session_id()
+    cached = session_store.get(session_id, 'portfolio_results')
+    if cached is None or cached[0] != job_id:
+        results = scheduler.result(job_id)
+        totals = currency_totals(results, data) if results is not None and not results.empty else None
+        cached = (job_id, results, totals)
+        session_store.put(session_id, 'portfolio_results', cached)
+    _, results, totals = cached
+    if results is None or results.empty:
+        return
+    currency = report_currency
+    report_idx = data.CURRENCY_INDEX[currency]
+    minor = data.MINOR_UNITS[report_idx]
+    decimals = data.CURRENCY_DECIMALS.get(currency, 2)
+
+    # Portfolio totals, summed exactly in minor units
+    c1, c2, c3, c4 = st.columns(4)
+    for col, column in zip((c1, c2, c3), MONEY_COLUMNS):
+        total = int(totals[column][report_idx]) / minor
+        col.metric(get_label(labels, column), f"{currency} {total:,.{decimals}f}")
+    c4.metric(get_label(labels, 'co2_saving'), f"{results['co2_saving_t'].sum():,.2f} t")
+    with st.expander(get_label(labels, 'portfolio_all_currencies')):
+        st.dataframe(pd.DataFrame(
+            {column: [f"{int(t) / m:,.{data.CURRENCY_DECIMALS.get(c, 2)}f}"
+                                         for t, m, c in zip(totals[column], data.MINOR_UNITS, data.CURRENCIES)]
+             for column in MONEY_COLUMNS},
+            index=data.CURRENCIES
+        ), use_container_width=True)
+
+    # One page of site results at a time
+    p1, p2 = st.columns(2)
+    with p1:
+        page_size = st.selectbox(get_label(labels, 'portfolio_page_size'), PAGE_SIZES, index=1)
+    pages = max(1, int(np.ceil(len(results) / page_size)))
+    with p2:
+        page = st.number_input(get_label(labels, 'portfolio_page'), min_value=1, max_value=pages, value=1)
+    st.caption(f"{len(results):,} sites · {page} / {pages}")
+    rows = results.iloc[(page - 1) * page_size: page * page_size]
+    st.dataframe(in_currency_units(in_report_currency(rows, currency, data), minor), use_container_width=True)
+
+    # The job ID already hashes the upload, so with the currency it addresses the CSV too
+    csv_data = get_artifact_cache().get_or_create(
+        'portfolio_csv', {'job': job_id, 'currency': currency},
+        lambda: in_currency_units(in_report_currency(results, currency, data), minor).to_csv(index=False).encode('utf-8'),
+        data
+    )
+    st.download_button(get_label(labels, 'download_csv'), csv_data, file_name=f"portfolio_{currency}.csv", mime='text/csv')
+    if upload is not None:
+        _retrofit_optimizer(labels, upload, currency, data)
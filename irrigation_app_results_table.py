@@ -0,0 +1,311 @@
+# Materialized results for standard scenarios.
+#
+#   python irrigation_app_results_table.py [--full] [--output irrigation_app_results.npz]
+#
+# A standard scenario is a flat water price, no planting mix, no escalation,
+# no block tariff and no replacements: the quotes most users ask for. For
+# those, the results of every city, area bucket and horizon are built once into
+# one indexed binary file (numpy .npz: the axis labels plus one float64 array
+# per result): per method its usage, capital and CO₂, and per base/comparison
+# pair the savings the overview shows (annual savings per unit of water price,
+# capex difference, payback at a unit water price and CO₂ saving). The
+# calculator and lookup_savings() answer from it by interpolating between area
+# buckets, and round money to the currency's minor units after interpolating,
+# as the live model does. Inputs outside the grid, or for a city whose data
+# changed since the build, go to the live model. Rebuilding only recomputes
+# the cities whose data changed. Capital is stored in the base currency (THB)
+# and converted with the active exchange rate at lookup, and the water price is
+# applied at lookup, so the file has neither a currency nor a price axis. The
+# model is linear in area, so interpolated figures agree with it to
+# floating-point precision; a rounded figure can be a minor unit off at a tie.
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+import numpy as np
+
+import irrigation_app_model as model
+
+TABLE_FILE = os.environ.get(
+    'IRRIGATION_RESULTS_TABLE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'irrigation_app_results.npz')
+)
+
+# Area grid in m²; the unit axis maps the entered area onto it (UNIT_MULTIPLIERS)
+AREA_BUCKETS_M2 = (100.0, 250.0, 500.0, 1000.0, 1600.0, 2500.0, 5000.0, 10000.0, 25000.0, 50000.0,
+                   100000.0, 250000.0, 1000000.0)
+
+# Tables that only affect one city (or its grid region) through the entries for
+# it; a change anywhere else rebuilds every city
+_CITY_TABLES = ('ET_DATA', 'updated_city_coefficients_reviewed', 'CITY_GRID_REGIONS', 'GRID_EMISSION_FACTORS',
+                'GRID_DECARBONIZATION')
+# Tables a standard scenario never reads
+_UNUSED_TABLES = ('WATER_TARIFFS', 'CITY_TARIFFS')
+# Arrays of the file, cities first. Per method: (cities, areas, methods), CO₂
+# (cities, horizons 0..MAX_YEARS, areas, methods). Per pair: the same with
+# (bases, comparisons) in place of methods
+METHOD_ARRAYS = ('usage_per_year', 'capital', 'co2_per_year', 'co2')
+PAIR_ARRAYS = ('savings_per_price', 'capex_diff', 'payback_price', 'co2_saving')
+ARRAYS = METHOD_ARRAYS + PAIR_ARRAYS
+
+logger = logging.getLogger('irrigation_app.results_table')
+
+
+def _digest(value):
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def global_digest(data):
+    """Digest of everything a standard result depends on besides the per-city entries."""
+    return _digest({name: table for name, table in data.tables.items()
+                    if name not in _CITY_TABLES and name not in _UNUSED_TABLES})
+
+
+def city_digest(data, city):
+    """Digest of the entries of one city and its grid region."""
+    region = data.CITY_GRID_REGIONS.get(city)
+    return _digest([data.ET_DATA[city], data.updated_city_coefficients_reviewed.get(city, 1.0), region,
+                    data.GRID_EMISSION_FACTORS.get(region), data.GRID_DECARBONIZATION.get(region)])
+
+
+def _pairs(values):
+    # (..., methods) -> (..., bases, comparisons): base minus comparison
+    return values[..., :, None] - values[..., None, :]
+
+
+def _build_cities(cities, data):
+    """Result arrays for some cities, in the file layout (cities first)."""
+    areas = np.asarray(AREA_BUCKETS_M2)
+    region_idx = data.CITY_REGION[model.index_of(cities, data.CITY_INDEX)]
+    et_mm = np.array([data.ET_DATA[city] for city in cities], dtype=float)
+    city_coefficient = np.array([data.updated_city_coefficients_reviewed.get(city, 1.0) for city in cities],
+                                dtype=float)
+
+    # The cost graph's stages (see irrigation_app_graph) on every (city, area bucket)
+    usage_per_year = model.water_usage(areas, et_mm[:, None], 1.0, data)
+    capital = model.base_capital(areas, city_coefficient[:, None], data)
+    pumping, diesel = model.yearly_emissions(usage_per_year, data.GRID_FACTORS[region_idx][:, None], data)
+    horizons = np.arange(data.MAX_YEARS + 1, dtype=float)
+    grid_horizon = model.grid_cumulative(data=data)[region_idx]  # (cities, horizons)
+    co2 = pumping[:, None] * grid_horizon[:, :, None, None] + diesel[:, None] * horizons[None, :, None, None]
+
+    savings_per_price = _pairs(usage_per_year * data.OPEX_RATIO)
+    capex_diff = _pairs(capital)
+    # Capex difference over annual savings at a water price of 1; both scale with
+    # area, so this is the same for every bucket. NaN where nothing pays back
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payback_price = np.where((savings_per_price > 0) & (capex_diff > 0), capex_diff / savings_per_price, np.nan)
+    return {
+        'usage_per_year': usage_per_year,
+        'capital': capital,
+        'co2_per_year': pumping + diesel,
+        'co2': co2,
+        'savings_per_price': savings_per_price,
+        'capex_diff': capex_diff,
+        'payback_price': payback_price,
+        'co2_saving': _pairs(co2),
+    }
+
+
+def build(path=TABLE_FILE, data=None, full=False):
+    """Build or refresh the table file; returns the cities that were (re)computed.
+
+    Rows of an existing file are kept for cities whose digest is unchanged,
+    as long as the shared tables, methods, area grid and horizon are the same.
+    """
+    data = data or model.current()
+    digest = global_digest(data)
+    digests = [city_digest(data, city) for city in data.CITIES]
+    old = None if full else _read(path)
+    reusable = {}
+    if (old is not None and old['global_digest'] == digest and old['methods'] == list(data.METHODS)
+            and old['area_m2'] == list(AREA_BUCKETS_M2) and old['co2'].shape[1] == data.MAX_YEARS + 1):
+        reusable = {city: i for i, (city, d) in enumerate(zip(old['cities'], old['city_digests']))
+                    if city in data.CITY_INDEX and d == digests[data.CITY_INDEX[city]]}
+    stale = [city for city in data.CITIES if city not in reusable]
+    fresh = _build_cities(stale, data) if stale else None
+
+    arrays = {}
+    for name in ARRAYS:
+        rows = []
+        for city in data.CITIES:
+            if city in reusable:
+                rows.append(old[name][reusable[city]])
+            else:
+                rows.append(fresh[name][stale.index(city)])
+        arrays[name] = np.stack(rows)
+
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, cities=np.array(data.CITIES), methods=np.array(data.METHODS), area_m2=np.array(AREA_BUCKETS_M2),
+             city_digests=np.array(digests), global_digest=np.array(digest), **arrays)
+    os.replace(tmp, path)
+    logger.info("Results table %s: %d of %d cities rebuilt", path, len(stale), len(data.CITIES))
+    return stale
+
+
+def _read(path):
+    try:
+        with np.load(path) as f:
+            table = {name: f[name] for name in f.files}
+    except (OSError, ValueError, KeyError):
+        return None
+    if any(name not in table for name in ARRAYS + ('area_m2',)):
+        return None  # written by an older layout; rebuilt in full
+    for name in ('cities', 'methods', 'area_m2', 'city_digests'):
+        table[name] = table[name].tolist()
+    table['global_digest'] = str(table['global_digest'])
+    return table
+
+
+class ResultsTable:
+    """A loaded table file with name -> position indexes for its axes."""
+
+    def __init__(self, table):
+        self.arrays = table
+        self.global_digest = table['global_digest']
+        self.city_index = {city: i for i, city in enumerate(table['cities'])}
+        self.methods = tuple(table['methods'])
+        self.method_index = {method: i for i, method in enumerate(self.methods)}
+        self.area_m2 = tuple(table['area_m2'])
+        self.city_digests = table['city_digests']
+
+    def usable(self, city, data):
+        """Whether the row of this city was built from the active data."""
+        i = self.city_index.get(city)
+        if i is None or self.methods != tuple(data.METHODS):
+            return False
+        digests = _digests(data)
+        return self.global_digest == digests['global'] and self.city_digests[i] == digests[city]
+
+    def bucket(self, m2):
+        """(lower bucket position, weight of the upper one) for an area in m² inside the grid."""
+        hi = min(max(bisect_left(self.area_m2, m2), 1), len(self.area_m2) - 1)
+        return hi - 1, (m2 - self.area_m2[hi - 1]) / (self.area_m2[hi] - self.area_m2[hi - 1])
+
+    def interpolate(self, name, index, bucket):
+        """Values of one array at an area, linear between the two neighbouring buckets."""
+        values = self.arrays[name][index]  # areas first
+        lo, w = bucket
+        return values[lo] * (1 - w) + values[lo + 1] * w
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _digests(data):
+    # Once per data snapshot: {'global': ..., city: ...}
+    return dict({city: city_digest(data, city) for city in data.CITIES}, **{'global': global_digest(data)})
+
+
+def get_table(path=TABLE_FILE):
+    """The table at path (reloaded when the file changes), or None without a file."""
+    global _table
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _table_lock:
+        if _table is None or _table[0] != (path, mtime):
+            table = _read(path)
+            _table = ((path, mtime), ResultsTable(table) if table is not None else None)
+        return _table[1]
+
+
+def _locate(area, unit, years, city, currency, data):
+    """(table, city position, area bucket) of standard inputs inside the grid, or None."""
+    table = get_table()
+    if table is None or currency not in data.CURRENCY_INDEX or unit not in data.UNIT_MULTIPLIERS \
+            or not 1 <= years <= data.MAX_YEARS or years != int(years) or not table.usable(city, data):
+        return None
+    m2 = area * data.UNIT_MULTIPLIERS[unit]
+    if not table.area_m2[0] <= m2 <= table.area_m2[-1]:
+        return None
+    return table, table.city_index[city], table.bucket(m2)
+
+
+def lookup_results(area, unit, years, city, price, currency, plant_mix=None, escalation=None, tariff=None,
+                   lifecycle=False, data=None):
+    """calculate_costs results from the table, or None when the inputs are not in it.
+
+    Takes the same arguments as calculate_costs and returns the same seven
+    {method: value} dicts, rounded the same way.
+    """
+    data = data or model.current()
+    if plant_mix or escalation or tariff or lifecycle:
+        return None
+    located = _locate(area, unit, years, city, currency, data)
+    if located is None:
+        return None
+    table, i, bucket = located
+    years = int(years)
+    usage_per_year = table.interpolate('usage_per_year', i, bucket)
+    capital = table.interpolate('capital', i, bucket) * data.EXCHANGE_RATES_FALLBACK[currency]
+    opex_per_year = model.yearly_bill(usage_per_year, price) * data.OPEX_RATIO
+    per_method = lambda values: dict(zip(table.methods, values.tolist()))
+    # Money in the currency's minor units, rounded and totalled as in money_batch
+    minor = data.MINOR_UNITS[data.CURRENCY_INDEX[currency]]
+    capital = model.to_minor(capital, minor)
+    opex_per_year = model.to_minor(opex_per_year, minor)
+    total = model.money_total(capital, opex_per_year, None, None, years, minor, flat=True)
+    usage_per_year = per_method(usage_per_year)
+    return (
+        usage_per_year,
+        {m: round(v * years, 2) for m, v in usage_per_year.items()},
+        per_method(model.from_minor(total, minor)),
+        per_method(model.from_minor(capital, minor)),
+        per_method(model.from_minor(opex_per_year, minor)),
+        per_method(table.interpolate('co2_per_year', i, bucket)),
+        per_method(table.interpolate('co2', (i, years), bucket)),
+    )
+
+
+def lookup_savings(city, currency, unit, area, years, base, comparison, price, data=None):
+    """Savings of `comparison` over `base` for a standard scenario, or None outside the table.
+
+    Same figures as the calculator's overview: annual and horizon savings,
+    capex difference, payback in years (None when nothing pays back) and CO₂
+    saving in kg. They come from the stored pair results, each rounded once,
+    so a saving can be a minor unit off the difference of the calculator's
+    rounded per-method figures.
+    """
+    data = data or model.current()
+    located = _locate(area, unit, years, city, currency, data)
+    if located is None or base not in data.METHODS or comparison not in data.METHODS:
+        return None
+    table, i, bucket = located
+    years = int(years)
+    pair = table.method_index[base], table.method_index[comparison]
+    value = lambda name, index: float(table.interpolate(name, index, bucket)[pair])
+    rate = data.EXCHANGE_RATES_FALLBACK[currency]
+    minor = data.MINOR_UNITS[data.CURRENCY_INDEX[currency]]
+    counts = model.to_minor(np.array([value('savings_per_price', i) * price, value('capex_diff', i) * rate]), minor)
+    annual, capex_diff = model.from_minor(counts, minor).tolist()
+    payback_price = value('payback_price', i)
+    return {
+        'annual_savings': annual,
+        'total_savings': annual * years,  # prices are flat in a standard scenario
+        'capex_diff': capex_diff,
+        'payback': round(payback_price * rate / price, 1)
+        if annual > 0 and capex_diff > 0 and np.isfinite(payback_price) else None,
+        'co2_saving': value('co2_saving', (i, years)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the materialized results table for standard scenarios.')
+    parser.add_argument('--output', default=TABLE_FILE, help='table file to write')
+    parser.add_argument('--full', action='store_true', help='rebuild every city, ignoring an existing file')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    build(args.output, full=args.full)
+
+
+if __name__ == '__main__':
+    main()
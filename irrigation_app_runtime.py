@@ -0,0 +1,247 @@
+# Irrigation volumes from controller runtime logs.
+#
+#   python irrigation_app_runtime.py logs/*.csv --output runtime.npz [--sites sites.csv] [--workers 4]
+#
+# A runtime log has one row per zone run: site, zone, start, duration and
+# flow rate, and optionally the method the controller ran under (Manual,
+# Auto, ET-Based, ...; matched to the model's methods ignoring case and
+# punctuation, runs under unknown methods are skipped and reported). Zones are summed into their site, so the zone column
+# is not read. Each run is turned into m³ (duration x flow) and
+# summed per site, method and calendar month of its start. Files are parsed
+# in parallel, one per worker process, each streamed in blocks by pyarrow's
+# CSV reader (see irrigation_app_meters) into small per-file totals that are
+# merged at the end. The totals are written as one columnar file (numpy .npz:
+# one array per column, one row per site, method and month; load_runtime()
+# reads it back as a DataFrame) and, with a site list, compared with the
+# model's usage_per_year the same way as meter readings.
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import irrigation_app_meters as meters
+import irrigation_app_model as model
+
+LOG_COLUMNS = ('site', 'start', 'duration', 'flow', 'method')
+# Minutes per duration unit, and m³ per minute per flow unit
+DURATION_UNITS = {'s': 1 / 60, 'min': 1.0, 'h': 60.0}
+FLOW_UNITS = {'lpm': 0.001, 'gpm': 0.003785411784, 'm3h': 1 / 60}
+
+logger = logging.getLogger('irrigation_app.runtime')
+
+
+def _method_key(name):
+    # 'auto', 'AUTO' and 'Auto' are one method, as are 'ET based' and 'ET-Based'
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+def parse_runtime_log(path, columns=LOG_COLUMNS, duration_unit='min', flow_unit='lpm', use_threads=True,
+                      methods=None, block_bytes=meters.BLOCK_BYTES):
+    """Totals of one log file as (volume, runtime, skipped), volume and runtime MeterTotals keyed by (site, method).
+
+    volume holds m³ and the number of runs, runtime the hours run. Logged
+    methods are matched to `methods` (default: the model's METHODS) ignoring
+    case, spaces and punctuation; runs under any other method are left out
+    and counted in skipped, {method as logged: runs}. The method is '' when
+    the log has no method column or the run has none. Rows with a missing
+    site, start, duration or flow are skipped. use_threads=False parses
+    on the calling thread only, for one process per file.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    if methods is None:
+        methods = model.current().METHODS
+    known = {_method_key(m): m for m in methods}
+    site_col, start_col, duration_col, flow_col, method_col = columns
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8-sig').strip().replace('"', '').split(',')
+    has_method = method_col in header
+    wanted = [site_col, start_col, duration_col, flow_col] + ([method_col] if has_method else [])
+    label = pa.dictionary(pa.int32(), pa.string())
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_bytes, use_threads=use_threads),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=wanted,
+            column_types={site_col: label, method_col: label, start_col: pa.timestamp('s'),
+                          duration_col: pa.float64(), flow_col: pa.float64()}
+        )
+    )
+    to_m3 = DURATION_UNITS[duration_unit] * FLOW_UNITS[flow_unit]
+    volume, runtime, skipped = meters.MeterTotals(), meters.MeterTotals(), {}
+    for batch in reader:
+        arrays = [batch.column(name) for name in wanted]
+        valid = pc.and_(pc.and_(pc.is_valid(arrays[0]), pc.is_valid(arrays[1])),
+                        pc.and_(pc.is_valid(arrays[2]), pc.is_valid(arrays[3])))
+        if valid.false_count:
+            arrays = [pc.filter(a, valid) for a in arrays]
+        sites, starts, durations, flows = arrays[:4]
+        site_idx = sites.indices.to_numpy(zero_copy_only=False)
+        month = pc.add(pc.multiply(pc.year(starts), 12), pc.subtract(pc.month(starts), 1)).to_numpy(
+            zero_copy_only=False)
+        duration = durations.to_numpy(zero_copy_only=False)
+        flow = flows.to_numpy(zero_copy_only=False)
+        if has_method:
+            logged = [m.strip() for m in arrays[4].dictionary.to_pylist()] + ['']
+            # Missing methods point past the dictionary, at ''; unknown ones map to None
+            block_methods = [known.get(_method_key(m)) if m else '' for m in logged]
+            method_idx = arrays[4].indices.fill_null(len(logged) - 1).to_numpy(zero_copy_only=False)
+            unknown = np.array([m is None for m in block_methods])[method_idx]
+            if unknown.any():
+                for i, runs in zip(*np.unique(method_idx[unknown], return_counts=True)):
+                    skipped[logged[i]] = skipped.get(logged[i], 0) + int(runs)
+                keep = ~unknown
+                site_idx, method_idx, month, duration, flow = (
+                    site_idx[keep], method_idx[keep], month[keep], duration[keep], flow[keep])
+        else:
+            block_methods, method_idx = [''], np.zeros(len(site_idx), dtype=np.int32)
+        # One key per (site, method) pair in the block's dictionaries; spellings of
+        # the same method share a key, so site_codes gives them the same code
+        pairs = site_idx.astype(np.int64) * len(block_methods) + method_idx
+        used, inverse = np.unique(pairs, return_inverse=True)
+        names = sites.dictionary.to_pylist()
+        keys = [(names[p // len(block_methods)], block_methods[p % len(block_methods)]) for p in used.tolist()]
+        codes = volume.site_codes(keys)[inverse]
+        runtime.site_codes(keys)
+        volume.add(codes, month, duration * flow * to_m3)
+        runtime.add(codes, month, duration * (DURATION_UNITS[duration_unit] / 60))
+    return volume, runtime, skipped
+
+
+def _parse(args):
+    # Worker entry point: (path, columns, duration_unit, flow_unit, use_threads, methods)
+    start = time.perf_counter()
+    totals = parse_runtime_log(*args)
+    return args[0], totals, time.perf_counter() - start
+
+
+def parse_runtime_logs(paths, workers=None, columns=LOG_COLUMNS, duration_unit='min', flow_unit='lpm', methods=None):
+    """Merged (volume, runtime, skipped) totals of many log files, parsed by up to `workers` processes."""
+    volume, runtime, skipped = meters.MeterTotals(), meters.MeterTotals(), {}
+    # Resolved here so every worker matches against the same snapshot
+    methods = list(model.current().METHODS if methods is None else methods)
+    workers = min(len(paths), workers or os.cpu_count() or 1)
+    # Across processes, each parses its file single-threaded rather than competing for the cores
+    jobs = [(path, columns, duration_unit, flow_unit, workers <= 1, methods) for path in paths]
+    if workers <= 1:
+        results = map(_parse, jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_parse, jobs)
+    try:
+        for path, (file_volume, file_runtime, file_skipped), seconds in results:
+            logger.info("%s: %.1fs (%.0f MB/s)", path, seconds, os.path.getsize(path) / 2**20 / max(seconds, 1e-9))
+            volume.merge(file_volume)
+            runtime.merge(file_runtime)
+            for method, runs in file_skipped.items():
+                skipped[method] = skipped.get(method, 0) + runs
+    finally:
+        if workers > 1:
+            pool.shutdown()
+    return volume, runtime, skipped
+
+
+def runtime_columns(volume, runtime):
+    """The totals as columns, one row per site, method and month with any runs."""
+    # Both were filled with the same keys and months, so their cells line up
+    cells = np.nonzero(volume.readings)
+    months = volume.months()[cells[1]]
+    hours = runtime.volume
+    keys = volume.sites
+    return {
+        'site': np.array([keys[i][0] for i in cells[0]], dtype=str),
+        'method': np.array([keys[i][1] for i in cells[0]], dtype=str),
+        'month': np.array([f"{m // 12:04d}-{m % 12 + 1:02d}" for m in months], dtype=str),
+        'volume_m3': volume.volume[cells],
+        'runtime_h': hours[cells],
+        'runs': volume.readings[cells],
+    }
+
+
+def write_runtime(path, columns):
+    """Write runtime columns to a .npz file, atomically."""
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **columns)
+    os.replace(tmp, path)
+
+
+def load_runtime(path):
+    """A runtime file as a DataFrame (site, method, month, volume_m3, runtime_h, runs)."""
+    with np.load(path) as f:
+        return pd.DataFrame({name: f[name] for name in f.files})
+
+
+def compare_runtime(volume, sites, data=None):
+    """Logged against modeled volumes per (site, method), as meters.compare_sites.
+
+    Runs logged without a method are counted under the site's base_method.
+    Keys whose method is not one of the model's METHODS are left out.
+    """
+    data = data or model.current()
+    keys = list(volume.site_index)
+    site_rows = {s: i for i, s in enumerate(sites['site'].astype(str))}
+    rows, row_keys, unknown = [], [], set()
+    for site, method in keys:
+        i = site_rows.get(str(site))
+        if i is None:
+            continue
+        if (method or sites['base_method'].iat[i]) not in data.METHODS:
+            unknown.add(method or sites['base_method'].iat[i])
+            continue
+        rows.append(i)
+        row_keys.append((site, method))
+    if unknown:
+        logger.warning("Left out of the comparison, not in METHODS: %s", ', '.join(sorted(map(repr, unknown))))
+    table = sites.iloc[rows].reset_index(drop=True)
+    table['base_method'] = [method or base for (_, method), base in zip(row_keys, table['base_method'])]
+    return meters.compare_sites(volume, table, data, keys=row_keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Turn controller runtime logs into irrigation volumes.')
+    parser.add_argument('logs', nargs='+', help='runtime log CSV files')
+    parser.add_argument('--output', required=True, help='columnar output file (.npz)')
+    parser.add_argument('--sites', help='site list (portfolio format) to compare with the model')
+    parser.add_argument('--workers', type=int, help='parallel processes (default: one per CPU)')
+    parser.add_argument('--columns', nargs=5, default=list(LOG_COLUMNS),
+                        metavar=('SITE', 'START', 'DURATION', 'FLOW', 'METHOD'), help='column names in the logs')
+    parser.add_argument('--duration-unit', choices=sorted(DURATION_UNITS), default='min')
+    parser.add_argument('--flow-unit', choices=sorted(FLOW_UNITS), default='lpm')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    start = time.perf_counter()
+    volume, runtime, skipped = parse_runtime_logs(args.logs, args.workers, tuple(args.columns), args.duration_unit,
+                                                  args.flow_unit)
+    if skipped:
+        logger.warning("Skipped %d run(s) with unknown methods: %s", sum(skipped.values()),
+                       ', '.join(f"{method!r} ({runs})" for method, runs in sorted(skipped.items())))
+    columns = runtime_columns(volume, runtime)
+    write_runtime(args.output, columns)
+    total_mb = sum(os.path.getsize(p) for p in args.logs) / 2**20
+    seconds = time.perf_counter() - start
+    logger.info("%d files, %.0f MB in %.1fs (%.0f MB/s); %d rows written to %s", len(args.logs), total_mb, seconds,
+                total_mb / max(seconds, 1e-9), len(columns['site']), args.output)
+
+    if args.sites:
+        from irrigation_app_portfolio import read_portfolio
+
+        with open(args.sites, 'rb') as f:
+            sites = read_portfolio(f.read(), args.sites)
+        comparison = compare_runtime(volume, sites)
+        print(f"{'method':<10}{'sites':>7}{'logged m³':>16}{'modeled m³':>16}{'logged/model':>14}")
+        for method, group in comparison.groupby('method'):
+            print(f"{method:<10}{len(group):>7}{group['observed_m3'].sum():>16,.0f}{group['modeled_m3'].sum():>16,.0f}"
+                  f"{group['observed_m3'].sum() / group['modeled_m3'].sum():>14.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# Server entry point: warms up the process, then starts Streamlit in it.
+#
+#   python irrigation_app_server.py [streamlit run options, e.g. --server.port 8501]
+#
+# Everything loaded here (imports, the matplotlib font cache, model lookup
+# tables, the results table) stays in this process, and the default
+# scenario's results go to the shared artifact store, so the first user after
+# a deploy does not pay for them.
+import logging
+import os
+import runpy
+import sys
+import time
+from contextlib import contextmanager
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'irrigation_app.py')
+
+logger = logging.getLogger('irrigation_app.warmup')
+
+
+@contextmanager
+def _timed(stage, timings):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+    logger.info("warm-up %-12s %6.2fs", stage, timings[stage])
+
+
+@contextmanager
+def _bare_mode():
+    # Running the page without a session logs "missing ScriptRunContext" for every widget
+    logging.disable(logging.WARNING)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def warm_up():
+    """Load heavy dependencies and fill caches before the server accepts traffic.
+
+    Returns {stage: seconds}; each stage is also logged so startup time can be watched.
+    """
+    timings = {}
+    with _timed('imports', timings):
+        import numpy  # noqa: F401
+        import pandas  # noqa: F401
+        import matplotlib
+        matplotlib.use('Agg')
+
+    with _timed('fonts', timings):
+        # Loading (or on a fresh host, building) the font cache is the slowest part of a cold matplotlib start
+        from matplotlib import font_manager
+        font_manager.findfont(font_manager.FontProperties(family='DejaVu Sans'))
+        import matplotlib.pyplot  # noqa: F401
+
+    with _timed('translations', timings):
+        from irrigation_app_translations import TRANSLATIONS, get_label
+        for labels in TRANSLATIONS.values():
+            get_label(labels, 'calculate_button')
+
+    with _timed('model', timings):
+        import irrigation_app_model as model
+        data = model.current()
+        model.cumulative_factors(data=data)
+        model.grid_cumulative(data=data)
+        for tariff in data.TARIFFS:
+            for currency in data.CURRENCIES:
+                model.tariff_for(tariff, currency, data)
+
+    with _timed('table', timings):
+        # Materialized standard-scenario inputs; only cities whose data changed are recomputed
+        import irrigation_app_results_table
+        irrigation_app_results_table.build(data=data)
+        irrigation_app_results_table.get_table()  # loaded and indexed once for every session
+
+    with _timed('script', timings), _bare_mode():
+        # Run the page once the way Streamlit does (as __main__), so its
+        # functions get the same st.cache_data keys as in the server
+        app = runpy.run_path(APP_SCRIPT, run_name='__main__')
+        for lang in TRANSLATIONS:
+            app['_summary_parts'](lang)  # precompiled overview template per language
+
+    with _timed('scenarios', timings), _bare_mode():
+        # Default scenario for every city and currency through the page's own path (results
+        # table, then the shared artifact store; the coalescer on a table miss), with the
+        # arguments a fresh page passes, so the first Calculate is a store hit
+        from irrigation_app_state import DEFAULT_INPUTS
+        for city in data.CITIES:
+            for currency in data.CURRENCIES:
+                calc_args = (DEFAULT_INPUTS['area'], data.UNITS[0], DEFAULT_INPUTS['years'], city,
+                             DEFAULT_INPUTS['water_price'], currency, None, None, None, False, data.version)
+                app['shared_results'](calc_args, data)
+
+    logger.info("warm-up done in %.2fs (%d cities x %d currencies precomputed)",
+                sum(timings.values()), len(data.CITIES), len(data.CURRENCIES))
+    return timings
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    warm_up()
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', APP_SCRIPT] + sys.argv[1:]
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+
+# ---------- SESSION MEMORY ----------
+# Per-session payloads (the cost graph, portfolio frames) are kept in one
+# process-wide store instead of st.session_state, so their memory is counted
+# per session and in total, and the payloads of idle tabs are dropped. Evicted
+# payloads are rebuilt on demand (the next Calculate, or a reload from the job store).
+SESSION_IDLE_SECONDS = float(os.environ.get('IRRIGATION_SESSION_IDLE_SECONDS', 30 * 60))
+SESSION_STORE_MAX_BYTES = int(os.environ.get('IRRIGATION_SESSION_STORE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate bytes held by obj and everything it references (each object counted once)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):  # pandas DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    size = sys.getsizeof(obj)  # includes the data buffer of arrays that own it, and whatever a __sizeof__ reports
+    if isinstance(obj, np.ndarray):
+        if obj.base is not None:
+            size += deep_sizeof(obj.base, seen)  # a view; its data belongs to the base
+    elif isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif type(obj).__sizeof__ is not object.__sizeof__:
+        pass  # the object measures what it holds (e.g. CostGraph)
+    elif hasattr(obj, '__slots__'):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, '__dict__') and not isinstance(obj, types.ModuleType):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def current_session_id():
+    """ID of the browser session running this script ('bare' outside a server)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else 'bare'
+
+
+class SessionStore:
+    """Per-session payloads with memory accounting and idle/size-bounded eviction.
+
+    touch() is called on every rerun with the size of the session's own
+    st.session_state, so stats() covers both. Payloads of sessions idle for
+    more than idle_seconds are dropped, then least recently seen ones until the
+    payload total fits max_bytes.
+    """
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, max_bytes=SESSION_STORE_MAX_BYTES):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._sessions = {}  # session_id -> {'seen', 'state_bytes', 'payload', 'payload_bytes'}
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {'seen': time.time(), 'state_bytes': 0, 'payload': {},
+                                                    'payload_bytes': {}}
+        return session
+
+    def touch(self, session_id, state=None):
+        """Mark the session active; state is its st.session_state, measured for the stats."""
+        state_bytes = deep_sizeof({k: state[k] for k in state}) if state is not None else None
+        with self._lock:
+            session = self._session(session_id)
+            session['seen'] = time.time()
+            if state_bytes is not None:
+                session['state_bytes'] = state_bytes
+            self._evict()
+
+    def get(self, session_id, key, default=None):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return default
+            session['seen'] = time.time()
+            return session['payload'].get(key, default)
+
+    def put(self, session_id, key, value):
+        size = deep_sizeof(value)
+        with self._lock:
+            session = self._session(session_id)
+            session['seen'] = time.time()
+            session['payload'][key] = value
+            session['payload_bytes'][key] = size
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        now = time.time()
+        for session_id, session in list(self._sessions.items()):
+            if now - session['seen'] > self.idle_seconds:
+                self.evicted += len(session['payload'])
+                del self._sessions[session_id]
+        total = sum(sum(s['payload_bytes'].values()) for s in self._sessions.values())
+        for session_id, session in sorted(self._sessions.items(), key=lambda item: item[1]['seen']):
+            if total <= self.max_bytes:
+                break
+            total -= sum(session['payload_bytes'].values())
+            self.evicted += len(session['payload'])
+            session['payload'].clear()
+            session['payload_bytes'].clear()
+
+    def stats(self):
+        """Session count, bytes per session and in total, and the implied MB per 1,000 sessions."""
+        with self._lock:
+            self._evict()
+            per_session = {sid: s['state_bytes'] + sum(s['payload_bytes'].values()) for sid, s in self._sessions.items()}
+            payload = sum(sum(s['payload_bytes'].values()) for s in self._sessions.values())
+            evicted = self.evicted
+        total = sum(per_session.values())
+        mean = total / len(per_session) if per_session else 0
+        return {
+            'sessions': len(per_session),
+            'total_bytes': total,
+            'payload_bytes': payload,
+            'mean_bytes_per_session': mean,
+            'max_bytes_per_session': max(per_session.values(), default=0),
+            'mb_per_1000_sessions': mean * 1000 / 2**20,
+            'evicted_payloads': evicted,
+            'idle_seconds': self.idle_seconds,
+            'max_payload_bytes': self.max_bytes
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide session store shared by all sessions."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
@@ -0,0 +1,82 @@
+import base64
+import json
+
+# ---------- URL STATE ----------
+# The calculator inputs and the key of the last shown result travel in the
+# page URL (?s=...&r=...), so a reload, a shared link or a request that lands
+# on another server process restores the same page. No sticky sessions are
+# needed: results themselves are read from the shared artifact store by key.
+STATE_PARAM = 's'
+RESULT_PARAM = 'r'
+
+# Short field names keep the URL small; values are plain JSON
+_FIELDS = {
+    'lang': 'l', 'city': 'c', 'unit': 'u', 'area': 'a', 'years': 'y', 'currency': 'k', 'water_price': 'p',
+    'tariff': 't', 'plant_mix': 'm', 'escalation_pct': 'e', 'lifecycle': 'lc', 'client': 'n',
+    'base_method': 'b', 'comp_method': 'v'
+}
+_NAMES = {short: name for name, short in _FIELDS.items()}
+
+# Inputs of a fresh calculator page
+DEFAULT_INPUTS = {
+    'lang': 'English', 'city': None, 'unit': None, 'area': 1600.0, 'years': 3, 'currency': None,
+    'water_price': 10.5, 'tariff': None, 'plant_mix': None, 'escalation_pct': None, 'lifecycle': False,
+    'client': 'Unnamed Project', 'base_method': 'Manual', 'comp_method': 'Auto'
+}
+
+
+def encode_inputs(inputs):
+    """Compact URL-safe token for the inputs (fields equal to the defaults are left out)."""
+    compact = {_FIELDS[name]: value for name, value in inputs.items()
+               if name in _FIELDS and value != DEFAULT_INPUTS.get(name)}
+    payload = json.dumps(compact, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_inputs(token, data, languages):
+    """Inputs from a token, checked against the reference data.
+
+    Unknown, malformed or out-of-range fields fall back to DEFAULT_INPUTS
+    (the first city, unit and currency where the default is None), so an old
+    or edited link always opens a valid page.
+    """
+    inputs = dict(DEFAULT_INPUTS, city=data.CITIES[0], unit=data.UNITS[0], currency=data.CURRENCIES[0])
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')) if token else {}
+    except (ValueError, TypeError):
+        return inputs
+    if not isinstance(raw, dict):
+        return inputs
+    raw = {_NAMES[short]: value for short, value in raw.items() if short in _NAMES}
+
+    def number(value, low, high):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and low <= value <= high
+
+    checks = {
+        'lang': lambda v: v in languages,
+        'city': lambda v: v in data.CITIES,
+        'unit': lambda v: v in data.UNITS,
+        'currency': lambda v: v in data.CURRENCIES,
+        'area': lambda v: number(v, 0, float('inf')),
+        'years': lambda v: isinstance(v, int) and number(v, 1, data.MAX_YEARS),
+        'water_price': lambda v: number(v, 0, float('inf')),
+        'tariff': lambda v: v in data.WATER_TARIFFS,
+        'plant_mix': lambda v: isinstance(v, list) and all(
+            isinstance(p, list) and len(p) == 2 and p[0] in data.KC_DATA and number(p[1], 0, 1) for p in v),
+        'escalation_pct': lambda v: isinstance(v, dict) and all(
+            part in data.ESCALATION_RATES and number(pct, -20, 50) for part, pct in v.items()),
+        'lifecycle': lambda v: isinstance(v, bool),
+        'client': lambda v: isinstance(v, str),
+        'base_method': lambda v: v in data.METHODS,
+        'comp_method': lambda v: v in data.METHODS,
+    }
+    for name, value in raw.items():
+        try:
+            valid = checks[name](value)
+        except TypeError:  # unhashable values in membership tests
+            valid = False
+        if valid:
+            inputs[name] = value
+    if inputs['plant_mix'] is not None:
+        inputs['plant_mix'] = tuple((plant, share) for plant, share in inputs['plant_mix'])
+    return inputs
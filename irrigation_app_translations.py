@@ -94,7 +94,11 @@ TRANSLATIONS = {
             </ul>
         </li>
         <li><b>OPEX Split:</b> Labor 40%, Electricity 30%, Water 30%.</li>
-        <li><b>CO₂ Savings:</b> Calculated as 0.5 tons per 1,000 m³ water saved.</li>
+        <li><b>Water Tariff (optional):</b> Utility block tariffs with fixed charges, billed on each month's share of annual usage, instead of the flat price per m³.</li>
+        <li><b>Equipment Replacement (optional):</b> Controllers, sensors, valves, hoses and trucks are re-purchased at their share of the original capital when their service life ends within the period.</li>
+        <li><b>Escalation (optional):</b> Yearly growth of water price, labor, electricity and ET, compounded over the selected period.</li>
+        <li><b>Landscape Coefficient (Kc):</b> Plant-type factor applied to city ET (turf 0.6–0.8, shrubs/trees 0.5, native 0.3); mixed plantings are weighted by area share.</li>
+        <li><b>CO₂ Savings:</b> Pumping energy (1 kWh per m³) times the city's grid emission factor (kg CO₂/kWh), plus diesel for truck delivery (0.4 L per m³).</li>
         </ul>
         <p><i>All figures are sourced from actual cost tables, project experience, and real world observations, see exemples detailed in this 
         <a href="https://github.com/alexangi/Rain_Bird_Irrigation_Savings_Calculator/raw/375a526e58e82d1c39c9a79a1ed5e80805d185dc/%E0%B8%A3%E0%B8%B2%E0%B8%A2%E0%B8%87%E0%B8%B2%E0%B8%99%E0%B8%81%E0%B8%B2%E0%B8%A3%E0%B8%99%E0%B8%B3%E0%B9%80%E0%B8%AA%E0%B8%99%E0%B8%AD%E0%B9%81%E0%B8%A5%E0%B8%B0%E0%B9%80%E0%B8%9B%E0%B8%A3%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B9%80%E0%B8%97%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B8%A3%E0%B8%B0%E0%B8%9A%E0%B8%9A%E0%B8%A3%E0%B8%94%E0%B8%99%E0%B9%89%E0%B8%B3%E0%B8%95.pdf" target="_blank" download>case study PDF report (Thai)</a>.
@@ -102,6 +106,42 @@ TRANSLATIONS = {
         """,
         "city_coefficient": "City Cost Coefficient",
         "construction_coefficient": "Construction Cost Coefficient",
+        "input_landscape": "Landscape / planting types",
+        "landscape_share": "Share of area (%)",
+        "landscape_coefficient": "Landscape Coefficient (Kc)",
+        "escalation_title": "Escalation (% per year)",
+        "escalation_water": "Water price",
+        "escalation_labor": "Labor",
+        "escalation_electricity": "Electricity",
+        "escalation_et": "ET growth (climate)",
+        "input_tariff": "Water tariff",
+        "tariff_flat": "Flat price (per m³)",
+        "input_lifecycle": "Include equipment replacements over the period",
+        "page_select": "Page",
+        "page_calculator": "Single Site",
+        "page_portfolio": "Portfolio",
+        "portfolio_title": "Portfolio Savings",
+        "portfolio_description": "Upload a CSV or Excel site list with columns `area` and `city`, and optionally `site`, `unit`, `years`, `currency`, `water_price`, `base_method`, `comparison_method` and `plant_type`.",
+        "portfolio_upload": "Site list (CSV / XLSX)",
+        "portfolio_process": "Process Portfolio",
+        "portfolio_processing": "Processing sites",
+        "portfolio_cancel": "Cancel",
+        "portfolio_cancelled": "Processing was cancelled.",
+        "portfolio_page_size": "Rows per page",
+        "portfolio_page": "Page",
+        "portfolio_all_currencies": "Totals in every currency",
+        "goal_seek_title": "Break-even finder",
+        "goal_seek_target": "Target",
+        "goal_seek_value": "Target value",
+        "goal_seek_solve": "Solve for",
+        "goal_seek_none": "No value within range reaches this target.",
+        "optimizer_title": "Retrofit plan within a budget",
+        "optimizer_budget": "CapEx budget",
+        "optimizer_objective": "Maximize",
+        "optimizer_water": "Water saved",
+        "optimizer_co2": "CO₂ saved",
+        "optimizer_sites": "Sites upgraded",
+        "optimizer_cost": "Plan cost",
         "water_efficiency": "Water Efficiency",
         "key_benefits": "Key Benefits",
         "annual_savings_description": "Reduction in operational expenses due to optimized irrigation methods, vital for long-term financial planning.",
@@ -149,7 +189,7 @@ TRANSLATIONS = {
     "base_method": "วิธีฐาน",
     "comparison_method": "วิธีเปรียบเทียบ",
     "roi": "ผลประโยชน์ทางการเงิน",
-    "chart_cost": "ต้นทุน (พันบาท)",
+    "chart_cost": "ต้นทุน (พัน)",
     "chart_water": "การใช้น้ำ (ลบ.ม.)",
     "chart_co2": "การปล่อย CO₂ (ตัน)",
     "asset_brief": "ภาพรวมการประหยัดและความยั่งยืน",
@@ -205,7 +245,7 @@ TRANSLATIONS = {
         </ul>
     </li>
     <li><b>สัดส่วน OPEX:</b> ค่าแรง 40%, ค่าไฟฟ้า 30%, ค่าน้ำ 30%</li>
-    <li><b>การลด CO₂:</b> 0.5 ตัน ต่อการประหยัดน้ำ 1,000 ลบ.ม.</li>
+    <li><b>การลด CO₂:</b> พลังงานสูบน้ำ (1 kWh ต่อ ลบ.ม.) คูณค่าการปล่อยก๊าซของระบบไฟฟ้าในเมืองนั้น (กก. CO₂/kWh) รวมกับน้ำมันดีเซลของรถน้ำ (0.4 ลิตร ต่อ ลบ.ม.)</li>
     </ul>
     <p><i>ข้อมูลทั้งหมดอ้างอิงจากตารางต้นทุนจริงและตัวอย่างการใช้งานจริง รายละเอียดเพิ่มเติมดูได้จาก
     <a href="https://github.com/alexangi/Rain_Bird_Irrigation_Savings_Calculator/raw/375a526e58e82d1c39c9a79a1ed5e80805d185dc/%E0%B8%A3%E0%B8%B2%E0%B8%A2%E0%B8%87%E0%B8%B2%E0%B8%99%E0%B8%81%E0%B8%B2%E0%B8%A3%E0%B8%99%E0%B8%B3%E0%B9%80%E0%B8%AA%E0%B8%99%E0%B8%AD%E0%B9%81%E0%B8%A5%E0%B8%B0%E0%B9%80%E0%B8%9B%E0%B8%A3%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B9%80%E0%B8%97%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B8%A3%E0%B8%B0%E0%B8%9A%E0%B8%9A%E0%B8%A3%E0%B8%94%E0%B8%99%E0%B9%89%E0%B8%B3%E0%B8%95.pdf" target="_blank" download>รายงานเคสตัวอย่าง (ภาษาไทย)</a>.
@@ -213,6 +253,40 @@ TRANSLATIONS = {
     """,
     "city_coefficient": "ค่าสัมประสิทธิ์ต้นทุนเมือง",
     "construction_coefficient": "ค่าสัมประสิทธิ์ต้นทุนก่อสร้าง",
+    "input_landscape": "ประเภทภูมิทัศน์ / พืชที่ปลูก",
+    "landscape_share": "สัดส่วนพื้นที่ (%)",
+    "landscape_coefficient": "ค่าสัมประสิทธิ์พืช (Kc)",
+    "escalation_title": "อัตราการปรับเพิ่ม (% ต่อปี)",
+    "escalation_water": "ค่าน้ำ",
+    "escalation_labor": "ค่าแรง",
+    "escalation_electricity": "ค่าไฟฟ้า",
+    "escalation_et": "การเพิ่มขึ้นของ ET (สภาพภูมิอากาศ)",
+    "input_tariff": "อัตราค่าน้ำ",
+    "tariff_flat": "ราคาคงที่ (ต่อ ลบ.ม.)",
+    "input_lifecycle": "รวมค่าเปลี่ยนอุปกรณ์ตลอดระยะเวลา",
+    "page_select": "หน้า",
+    "page_calculator": "โครงการเดียว",
+    "page_portfolio": "พอร์ตโฟลิโอ",
+    "portfolio_title": "การประหยัดของพอร์ตโฟลิโอ",
+    "portfolio_upload": "รายการพื้นที่ (CSV / XLSX)",
+    "portfolio_process": "ประมวลผลพอร์ตโฟลิโอ",
+    "portfolio_processing": "กำลังประมวลผล",
+    "portfolio_cancel": "ยกเลิก",
+    "portfolio_page_size": "จำนวนแถวต่อหน้า",
+    "portfolio_page": "หน้า",
+    "portfolio_all_currencies": "ยอดรวมในทุกสกุลเงิน",
+    "goal_seek_title": "หาจุดคุ้มทุน",
+    "goal_seek_target": "เป้าหมาย",
+    "goal_seek_value": "ค่าเป้าหมาย",
+    "goal_seek_solve": "หาค่าของ",
+    "goal_seek_none": "ไม่มีค่าในช่วงที่ถึงเป้าหมายนี้",
+    "optimizer_title": "แผนปรับปรุงระบบภายในงบประมาณ",
+    "optimizer_budget": "งบลงทุน",
+    "optimizer_objective": "เพิ่มสูงสุด",
+    "optimizer_water": "น้ำที่ประหยัดได้",
+    "optimizer_co2": "CO₂ ที่ลดได้",
+    "optimizer_sites": "จำนวนพื้นที่ที่ปรับปรุง",
+    "optimizer_cost": "ต้นทุนของแผน",
     "annual_savings_description": "การลดต้นทุนการดำเนินงานด้วยวิธีชลประทานที่มีประสิทธิภาพ เหมาะสำหรับการวางแผนระยะยาว",
     "total_savings_description": "การประหยัดโดยรวมจากการใช้น้ำที่เหมาะสมและลดการสูญเสีย ตลอดระยะเวลา {years} ปี",
     "capex_diff_description": "ความแตกต่างของการลงทุนเริ่มต้นระหว่างวิธีฐานและวิธีเปรียบเทียบ",
@@ -274,7 +348,7 @@ TRANSLATIONS = {
             </ul>
         </li>
         <li><b>Tỷ lệ chi phí vận hành (OPEX):</b> Lao động 40%, điện 30%, nước 30% (theo chi tiết PDF)</li>
-        <li><b>Tiết kiệm CO₂:</b> Tính theo 0,5 tấn CO₂ cho mỗi 1.000 m³ nước tiết kiệm</li>
+        <li><b>Tiết kiệm CO₂:</b> Năng lượng bơm (1 kWh mỗi m³) nhân với hệ số phát thải của lưới điện tại thành phố (kg CO₂/kWh), cộng với dầu diesel cho xe chở nước (0,4 L mỗi m³)</li>
         </ul>
         <p><i>Tất cả các số liệu đều được lấy từ bảng chi phí thực tế, kinh nghiệm dự án và quan sát thực tế. Ví dụ chi tiết được trình bày trong 
         <a href="https://github.com/alexangi/Rain_Bird_Irrigation_Savings_Calculator/raw/375a526e58e82d1c39c9a79a1ed5e80805d185dc/%E0%B8%A3%E0%B8%B2%E0%B8%A2%E0%B8%87%E0%B8%B2%E0%B8%99%E0%B8%81%E0%B8%B2%E0%B8%A3%E0%B8%99%E0%B8%B3%E0%B9%80%E0%B8%AA%E0%B8%99%E0%B8%AD%E0%B9%81%E0%B8%A5%E0%B8%B0%E0%B9%80%E0%B8%9B%E0%B8%A3%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B9%80%E0%B8%97%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B8%A3%E0%B8%B0%E0%B8%9A%E0%B8%9A%E0%B8%A3%E0%B8%94%E0%B8%99%E0%B9%89%E0%B8%B3%E0%B8%95.pdf" target="_blank" download>báo cáo nghiên cứu điển hình (Tiếng Việt)</a>.
@@ -436,7 +510,7 @@ TRANSLATIONS = {
             </ul>
         </li>
         <li><b>Proporsi Biaya Operasional (OPEX):</b> Tenaga kerja 40%, listrik 30%, air 30% (mengacu rincian pada PDF)</li>
-        <li><b>Penghematan CO₂:</b> Dihitung 0,5 ton CO₂ untuk setiap 1.000 m³ air yang dihemat</li>
+        <li><b>Penghematan CO₂:</b> Energi pompa (1 kWh per m³) dikalikan faktor emisi jaringan listrik kota (kg CO₂/kWh), ditambah solar untuk truk air (0,4 L per m³)</li>
         </ul>
         <p><i>Semua angka bersumber dari tabel biaya aktual, pengalaman proyek, dan pengamatan di dunia nyata. Contoh lengkap dijelaskan dalam
         <a href="https://github.com/alexangi/Rain_Bird_Irrigation_Savings_Calculator/raw/375a526e58e82d1c39c9a79a1ed5e80805d185dc/%E0%B8%A3%E0%B8%B2%E0%B8%A2%E0%B8%87%E0%B8%B2%E0%B8%99%E0%B8%81%E0%B8%B2%E0%B8%A3%E0%B8%99%E0%B8%B3%E0%B9%80%E0%B8%AA%E0%B8%99%E0%B8%AD%E0%B9%81%E0%B8%A5%E0%B8%B0%E0%B9%80%E0%B8%9B%E0%B8%A3%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B9%80%E0%B8%97%E0%B8%B5%E0%B8%A2%E0%B8%9A%E0%B8%A3%E0%B8%B0%E0%B8%9A%E0%B8%9A%E0%B8%A3%E0%B8%94%E0%B8%99%E0%B9%89%E0%B8%B3%E0%B8%95.pdf" target="_blank" download>laporan studi kasus (Bahasa Indonesia)</a>.
@@ -972,3 +1046,12 @@ TRANSLATIONS = {
         }
     }
 }
+
+
+def get_label(labels, key, fallback_lang="English"):
+    """Return the label if available, else fallback to English."""
+    if key in labels:
+        return labels[key]
+    else:
+        # Fallback to English if the label is missing
+        return TRANSLATIONS[fallback_lang].get(key, key)
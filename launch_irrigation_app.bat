@@ -1,3 +1,3 @@
 @echo off
-streamlit run irrigation_app.py
+python irrigation_app_server.py
 pause
\ No newline at end of file